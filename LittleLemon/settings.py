@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .databases import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'LittleLemonAPI.instrumentation.InstrumentationMiddleware',
+    'LittleLemonAPI.routers.StickyPrimaryMiddleware',
+    'LittleLemonAPI.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,14 +83,194 @@ WSGI_APPLICATION = 'LittleLemon.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# Configured from DATABASE_URL and DATABASE_REPLICA_URLS (see
+# LittleLemon/databases.py); db.sqlite3 without replicas by default. Catalog,
+# order listing and report reads go to a replica, except for clients that
+# wrote within the last DATABASE_STICKY_SECONDS. Write markers are kept in
+# the DATABASE_STICKY_CACHE_ALIAS cache, which must be shared between workers.
+
+DATABASES, DATABASE_REPLICAS = database_settings(os.environ, BASE_DIR)
+
+DATABASE_ROUTERS = ['LittleLemonAPI.routers.PrimaryReplicaRouter']
+
+DATABASE_STICKY_SECONDS = 10
+
+DATABASE_STICKY_CACHE_ALIAS = 'default'
+
+# Checkout and cart writes that SQLite refuses with "database is locked" are
+# retried this many times, with backoff starting at DATABASE_LOCK_RETRY_DELAY
+# seconds, after the connection's busy_timeout has run out.
+
+DATABASE_LOCK_RETRIES = 5
+
+DATABASE_LOCK_RETRY_DELAY = 0.05
+
 
-DATABASES = {
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The catalog alias holds cached menu and category responses and the
+# catalog version; point it at a shared backend (e.g. Redis or Memcached)
+# when running several workers.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'TIMEOUT': 300,
+    },
 }
 
+CATALOG_CACHE_ALIAS = 'catalog'
+
+
+# Response compression
+# Responses of at least COMPRESSION_MIN_SIZE bytes are compressed with the
+# first of COMPRESSION_ENCODINGS the client accepts (by q-value, then in
+# this order). zstd and br need the zstandard and brotli packages and are
+# skipped without them.
+
+COMPRESSION_ENCODINGS = ['zstd', 'br', 'gzip']
+
+COMPRESSION_MIN_SIZE = 1024
+
+COMPRESSION_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+
+# Instrumentation
+# Fraction of requests (0 to 1) that record query, serializer and throttle
+# timings and return a Server-Timing header. Request durations are always
+# recorded; /metrics is readable from INTERNAL_IPS and by staff users.
+
+INSTRUMENTATION_SAMPLE_RATE = 0.0
+
+INTERNAL_IPS = ['127.0.0.1']
+
+
+# Throttling
+# Where the rate throttles keep their counters. The cache store uses the
+# THROTTLE_CACHE_ALIAS backend and is shared between processes only if that
+# cache is; SQLiteThrottleStore shares a file between all workers on a host.
+
+THROTTLE_STORE = 'LittleLemonAPI.throttling.CacheThrottleStore'
+
+THROTTLE_CACHE_ALIAS = 'default'
+
+THROTTLE_SQLITE_PATH = BASE_DIR / 'throttle.sqlite3'
+
+
+# Role cache
+# Users' group names are cached in the ROLE_CACHE_ALIAS cache for
+# ROLE_CACHE_TIMEOUT seconds and dropped when a membership change commits.
+# Point it at a shared backend (e.g. Redis or Memcached) when running several
+# workers; with a per-process cache the other workers keep a user's old
+# roles until their entry expires.
+
+ROLE_CACHE_ALIAS = 'default'
+
+ROLE_CACHE_TIMEOUT = 30
+
+
+# Token authentication cache
+# Recently used tokens are kept in a per-process LRU for TOKEN_CACHE_TIMEOUT
+# seconds. With TOKEN_CACHE_HASH_KEYS the LRU is keyed by a SHA-256 digest
+# of the token instead of the raw key.
+
+TOKEN_CACHE_SIZE = 1024
+
+TOKEN_CACHE_TIMEOUT = 60
+
+TOKEN_CACHE_HASH_KEYS = True
+
+
+# Order change feed
+# New entries are announced through the ORDER_FEED_CACHE_ALIAS cache, which
+# waiting clients read every ORDER_FEED_POLL_INTERVAL seconds; it has to be
+# shared for changes made in one worker process to wake clients of another.
+# Long polls wait at most ORDER_FEED_MAX_WAIT seconds and event streams are
+# closed after ORDER_FEED_STREAM_DURATION seconds.
+
+ORDER_FEED_CACHE_ALIAS = 'default'
+
+ORDER_FEED_POLL_INTERVAL = 0.2
+
+ORDER_FEED_PAGE_SIZE = 100
+
+ORDER_FEED_MAX_WAIT = 25
+
+ORDER_FEED_STREAM_DURATION = 300
+
+ORDER_FEED_KEEPALIVE = 15
+
+
+# Async views
+# GETs of the catalog, menu item detail and order feed are answered on the
+# event loop, with long polling and event streams for the feed. That only
+# pays off under ASGI, which LittleLemon/asgi.py turns this on for; under
+# WSGI the URLs are routed to the sync views, which never wait.
+
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+
+
+# Delivery crew assignment
+# The most orders POST /api/orders/assign hands out in one transaction.
+
+ASSIGNMENT_BATCH_SIZE = 1000
+
+
+# Bulk catalog import
+# Rows of /api/menu-items/bulk and /api/categories/bulk are validated and
+# written CATALOG_BATCH_SIZE at a time, so imports use constant memory.
+
+CATALOG_BATCH_SIZE = 1000
+
+
+# Sales reports
+# Date range of /api/reports/* when no ?start= is given, and how many days
+# rebuild_sales_reports recomputes per transaction.
+
+REPORTS_DEFAULT_DAYS = 30
+
+REPORTS_REBUILD_CHUNK_DAYS = 31
+
+
+# Cart prices
+# Cart rows copy the menu item's price when they are added. A menu price
+# change re-prices the rows holding the item, except those priced less than
+# CART_PRICE_LOCK seconds ago: they keep the price the customer was shown
+# until the lock runs out, and checkout charges the current price after
+# that. 0 turns the lock off. Bulk price changes re-price carts
+# CART_PRICE_REFRESH_BATCH_SIZE menu items per UPDATE.
+
+CART_PRICE_LOCK = 0
+
+CART_PRICE_REFRESH_BATCH_SIZE = 500
+
+# Background tasks
+# Checkout writes one outbox task per entry of ORDER_PLACED_TASKS (dotted
+# paths of functions taking the order id) in its own transaction. Once it
+# commits, TASK_WORKER_THREADS threads in the web process run them; set it to
+# 0 when `manage.py run_tasks` runs them in a separate process instead. A
+# failing task is retried after TASK_RETRY_DELAY seconds, doubling each time,
+# up to TASK_MAX_ATTEMPTS attempts; a task not finished within TASK_LEASE
+# seconds is handed to another worker.
+
+ORDER_PLACED_TASKS = ['LittleLemonAPI.receipts.send_order_receipt']
+
+TASK_WORKER_THREADS = 2
+
+TASK_POLL_INTERVAL = 5
+
+TASK_MAX_ATTEMPTS = 5
+
+TASK_RETRY_DELAY = 10
+
+TASK_LEASE = 300
+
+# Receipts are printed to the console until an SMTP server is configured
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -136,21 +322,23 @@ REST_FRAMEWORK = {
     ],
 
    'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'LittleLemonAPI.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'LittleLemonAPI.renderers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ),
 
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle', 
-        'rest_framework.throttling.UserRateThrottle', 
+        'LittleLemonAPI.throttling.AnonRateThrottle',
+        'LittleLemonAPI.throttling.UserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '10/day',  # Allow 10 requests per day for anonymous users
         'user': '100/day',  # Allow 100 requests per day for authenticated users
+        # Per-route limits use '<anon|user>.<throttle_scope>', e.g. 'user.orders': '20/hour'
+        'user.order_feed': '5000/day',  # A long-polling client makes a request every ORDER_FEED_MAX_WAIT seconds
     },
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -0,0 +1,125 @@
+import heapq
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.db.models import Case, Count, F, Value, When
+
+from .cache import bump_list_version
+from .feed import record_assignments
+from .models import AssignmentPolicy, CrewWorkload, Order
+from .permissions import DELIVERY_CREW
+
+
+class NoDeliveryCrewError(Exception):
+    """Raised when orders are to be assigned but nobody is in the delivery crew."""
+
+
+def least_loaded(crew, count):
+    """Give each order to the crew member with the fewest open orders at that point."""
+    heap = [(open_orders, last_assigned, pk) for pk, open_orders, last_assigned in crew]
+    heapq.heapify(heap)
+    assigned = []
+    for _ in range(count):
+        open_orders, last_assigned, pk = heap[0]
+        assigned.append(pk)
+        heapq.heapreplace(heap, (open_orders + 1, last_assigned, pk))
+    return assigned
+
+
+def round_robin(crew, count):
+    """Take turns, starting with whoever was assigned an order longest ago."""
+    turns = [pk for pk, _, _ in sorted(crew, key=lambda member: (member[2], member[0]))]
+    return [turns[i % len(turns)] for i in range(count)]
+
+
+POLICIES = {AssignmentPolicy.LEAST_LOADED: least_loaded, AssignmentPolicy.ROUND_ROBIN: round_robin}
+
+
+def assign_orders(policy=AssignmentPolicy.LEAST_LOADED, limit=None):
+    """
+    Give unassigned open orders, oldest first, to the delivery crew.
+
+    Up to ``limit`` orders (at most ASSIGNMENT_BATCH_SIZE) are assigned in
+    one transaction with a fixed number of queries: the crew workloads and
+    the waiting orders are read once, the assignment is computed in Python
+    and written with one UPDATE of the orders and one of the workloads.
+    Returns a Counter of orders assigned per crew member.
+    """
+    batch_size = getattr(settings, 'ASSIGNMENT_BATCH_SIZE', 1000)
+    limit = min(limit or batch_size, batch_size)
+    using = router.db_for_write(Order)
+    with transaction.atomic(using=using):
+        workloads = CrewWorkload.objects.using(using)
+        # Take the write lock before reading, like checkout(): concurrent
+        # runs queue up instead of handing out the same orders
+        if not workloads.update(open_orders=F('open_orders')):
+            raise NoDeliveryCrewError('Nobody is in the delivery crew.')
+        crew = list(workloads.values_list('user_id', 'open_orders', 'last_assigned'))
+        orders = list(
+            Order.objects.using(using).filter(status=False, delivery_crew=None)
+            .select_for_update(skip_locked=True).order_by('pk').values_list('pk', 'user_id')[:limit]
+        )
+        if not orders:
+            return Counter()
+        order_ids = [pk for pk, _ in orders]
+
+        assigned = POLICIES[policy](crew, len(order_ids))
+        orders_by_crew = {}
+        for order_id, crew_id in zip(order_ids, assigned):
+            orders_by_crew.setdefault(crew_id, []).append(order_id)
+        Order.objects.using(using).filter(pk__in=order_ids).update(delivery_crew=Case(
+            *[When(pk__in=orders, then=Value(crew_id)) for crew_id, orders in orders_by_crew.items()]))
+
+        counts = Counter(assigned)
+        # Remember when each crew member was last given an order, for round-robin
+        first_turn = max(last_assigned for _, _, last_assigned in crew) + 1
+        last_turns = {crew_id: first_turn + i for i, crew_id in enumerate(assigned)}
+        workloads.filter(user_id__in=counts).update(
+            open_orders=F('open_orders') + Case(*[When(user_id=pk, then=Value(n)) for pk, n in counts.items()]),
+            last_assigned=Case(*[When(user_id=pk, then=Value(turn)) for pk, turn in last_turns.items()]),
+        )
+        record_assignments(order_ids, using)
+        bump_list_version('orders', *{user_id for _, user_id in orders}, using=using)
+    return counts
+
+
+def open_order_crew(state):
+    """The crew member an order counts against, given its (status, delivery crew id)."""
+    status, crew_id = state
+    return None if status else crew_id
+
+
+def adjust_workloads(previous, current, using=None):
+    """Move an open order between crew workloads when its status or delivery crew changes."""
+    before, after = open_order_crew(previous), open_order_crew(current)
+    if before == after:
+        return
+    CrewWorkload.objects.using(using).filter(user_id__in=[pk for pk in (before, after) if pk is not None]).update(
+        open_orders=Case(
+            When(user_id=after, then=F('open_orders') + 1),
+            When(open_orders=0, then=Value(0)),
+            default=F('open_orders') - 1,
+        ))
+
+
+def sync_workloads(user_pks=None, using=None):
+    """
+    Create or drop workload rows to match delivery crew membership and
+    recount their open orders, for ``user_pks`` or everyone.
+    """
+    crew = User.objects.using(using).filter(groups__name=DELIVERY_CREW)
+    workloads = CrewWorkload.objects.using(using)
+    if user_pks is not None:
+        crew = crew.filter(pk__in=user_pks)
+        workloads = workloads.filter(user_id__in=user_pks)
+    workloads.exclude(user__in=crew).delete()
+    counts = dict(
+        Order.objects.using(using).filter(status=False, delivery_crew__in=crew)
+        .values('delivery_crew').annotate(count=Count('pk')).values_list('delivery_crew', 'count')
+    )
+    CrewWorkload.objects.using(using).bulk_create(
+        [CrewWorkload(user_id=pk, open_orders=counts.get(pk, 0)) for pk in crew.values_list('pk', flat=True)],
+        update_conflicts=True, unique_fields=['user'], update_fields=['open_orders'],
+    )
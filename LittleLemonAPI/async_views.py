@@ -0,0 +1,240 @@
+import time
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import classonlymethod
+from django.utils.http import http_date
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, ValidationError as DRFValidationError
+from rest_framework.settings import api_settings
+
+from . import views
+from .authentication import aauthenticate_token
+from .cache import acatalog_state, catalog_cache, catalog_cache_key, format_etag
+from .feed import HEAD_KEY, afeed_page, alatest_sequence, await_head_change, feed_cache, feed_params, feed_response_data
+from .models import MenuItem
+from .permissions import user_roles
+from .routers import ReplicaReadsMixin, areads_from_replica, replica_reads
+
+
+def render_json(data):
+    return api_settings.DEFAULT_RENDERER_CLASSES[0]().render(data)
+
+
+def json_response(data, status=200):
+    return HttpResponse(render_json(data), status=status, content_type='application/json')
+
+
+async def atoken_user(request):
+    """Return the user of a valid ``Authorization: Token`` header, or None."""
+    scheme, _, key = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'token' or not key:
+        return None
+    authenticated = await aauthenticate_token(key.strip())
+    return authenticated[0] if authenticated is not None else None
+
+
+async def acheck_throttles(view, request, user):
+    """
+    Run the view's rate throttles through their async store API.
+
+    Returns the number of seconds to wait when a throttle refuses the
+    request, or None when it is allowed.
+    """
+    throttle_request = SimpleNamespace(user=user or AnonymousUser(), META=request.META, headers=request.headers)
+    for throttle_class in view.throttle_classes:
+        throttle = throttle_class()
+        if not await throttle.aallow_request(throttle_request, view):
+            return throttle.wait()
+    return None
+
+
+def throttled_response(wait):
+    response = json_response({'detail': f'Request was throttled. Expected available in {int(wait)} seconds.'}, 429)
+    response['Retry-After'] = str(int(wait))
+    return response
+
+
+class AsyncReadView(View):
+    """
+    Serve GET requests natively on the event loop and hand every other
+    request, and any GET the async path does not cover, to the sync DRF view
+    that owns the URL. Only routed to under ASGI (see ASYNC_VIEWS); writes
+    then run in a thread as they would for the sync view itself.
+    """
+    sync_view_class = None
+    sync_view = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        sync_view = sync_to_async(cls.sync_view_class.as_view())
+        # The sync DRF view enforces CSRF itself for session-authenticated writes
+        return csrf_exempt(super().as_view(sync_view=sync_view, **initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        replica = issubclass(self.sync_view_class, ReplicaReadsMixin) and await areads_from_replica(request)
+        with replica_reads(replica):
+            response = None
+            if request.method in ('GET', 'HEAD') and self.wants_json(request):
+                response = await self.get(request, *args, **kwargs)
+            if response is None:
+                response = await self.sync_view(request, *args, **kwargs)
+        return response
+
+    @staticmethod
+    def wants_json(request):
+        # The browsable API and format overrides are left to DRF
+        return 'text/html' not in request.headers.get('Accept', '') and 'format' not in request.GET
+
+    def drf_view(self, request, *args, **kwargs):
+        """Set up an instance of the sync view for its queryset, filters and paginator."""
+        view = self.sync_view_class()
+        drf_request = view.initialize_request(request, *args, **kwargs)
+        view.request, view.args, view.kwargs, view.format_kwarg = drf_request, args, kwargs, None
+        return view
+
+
+class AsyncCatalogListView(AsyncReadView):
+    """
+    Async list endpoint for the public catalog. Anonymous requests are
+    answered from the catalog cache and conditional GET headers on the event
+    loop; a cache miss runs the sync view's own filters, ordering and
+    paginator in a thread.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        if 'HTTP_AUTHORIZATION' in request.META or settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return None
+        view = self.drf_view(request, *args, **kwargs)
+        wait = await acheck_throttles(view, request, None)
+        if wait is not None:
+            return throttled_response(wait)
+
+        version, modified = await acatalog_state()
+        etag = format_etag(version)
+        response = get_conditional_response(request, etag=etag, last_modified=int(modified))
+        if response is None:
+            key = catalog_cache_key(view.request, version)
+            data = await catalog_cache().aget(key)
+            if data is None:
+                try:
+                    data = await sync_to_async(view.list_data)(view.request, *args, **kwargs)
+                except APIException:
+                    # Invalid filters or pages; let the sync view report them
+                    return None
+                await catalog_cache().aset(key, data)
+            response = json_response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        response['Vary'] = 'Accept'
+        return response
+
+
+class MenuItemAsyncView(AsyncCatalogListView):
+    sync_view_class = views.MenuItemView
+
+
+class CategoryAsyncView(AsyncCatalogListView):
+    sync_view_class = views.CategoryView
+
+
+class MenuDetailAsyncView(AsyncReadView):
+    """Async menu item detail for token-authenticated clients."""
+    sync_view_class = views.MenuDetailView
+
+    async def get(self, request, pk):
+        user = await atoken_user(request)
+        if user is None:
+            return None
+
+        view = self.drf_view(request, pk=pk)
+        wait = await acheck_throttles(view, request, user)
+        if wait is not None:
+            return throttled_response(wait)
+
+        menuitem = await MenuItem.objects.select_related('category').filter(pk=pk).afirst()
+        if menuitem is None:
+            return None
+        # The view's serializer context carries ?fields= and ?expand=
+        return json_response(view.get_serializer(menuitem).data)
+
+
+class OrderChangeAsyncView(AsyncReadView):
+    """
+    The order change feed for token-authenticated clients, on the event loop.
+
+    With ``?timeout=<seconds>`` an empty poll waits up to that long for new
+    entries (long polling). With ``Accept: text/event-stream`` entries are
+    pushed as server-sent events, resuming from ``Last-Event-ID`` or
+    ``since``, until ORDER_FEED_STREAM_DURATION passes and the client
+    reconnects. Waiting clients cost one cache read per poll interval and no
+    queries until a change is announced.
+    """
+    sync_view_class = views.OrderChangeView
+
+    async def get(self, request):
+        user = await atoken_user(request)
+        if user is None:
+            return None
+        params = request.GET.copy()
+        if 'HTTP_LAST_EVENT_ID' in request.META:
+            params['since'] = request.META['HTTP_LAST_EVENT_ID']
+        try:
+            since, timeout, limit = feed_params(params)
+        except DRFValidationError:
+            return None
+
+        view = self.drf_view(request)
+        wait = await acheck_throttles(view, request, user)
+        if wait is not None:
+            return throttled_response(wait)
+
+        roles = await sync_to_async(user_roles)(user)
+        if since is None:
+            since = await alatest_sequence()
+            if 'text/event-stream' not in request.headers.get('Accept', ''):
+                return json_response(feed_response_data(since, []))
+        if 'text/event-stream' in request.headers.get('Accept', ''):
+            response = StreamingHttpResponse(self.events(user, roles, since, limit), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            # Keep proxies from buffering the stream
+            response['X-Accel-Buffering'] = 'no'
+            return response
+        return json_response(await self.poll(user, roles, since, limit, timeout))
+
+    @staticmethod
+    async def poll(user, roles, since, limit, timeout):
+        deadline = time.monotonic() + timeout
+        # Read the head before querying so an announcement in between is not missed
+        head = await feed_cache().aget(HEAD_KEY)
+        while True:
+            results = await afeed_page(user, roles, since, limit)
+            remaining = deadline - time.monotonic()
+            if results or remaining <= 0:
+                return feed_response_data(since, results)
+            head = await await_head_change(head, remaining)
+
+    @staticmethod
+    async def events(user, roles, cursor, limit):
+        end = time.monotonic() + getattr(settings, 'ORDER_FEED_STREAM_DURATION', 300)
+        keepalive = getattr(settings, 'ORDER_FEED_KEEPALIVE', 15)
+        head = await feed_cache().aget(HEAD_KEY)
+        while True:
+            results = await afeed_page(user, roles, cursor, limit)
+            for change in results:
+                yield f"id: {change['seq']}\nevent: order\ndata: {render_json(change).decode()}\n\n"
+            if results:
+                cursor = results[-1]['seq']
+                continue
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            new_head = await await_head_change(head, min(keepalive, remaining))
+            if new_head == head:
+                yield ': keepalive\n\n'
+            head = new_head
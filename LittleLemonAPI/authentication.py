@@ -0,0 +1,112 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """
+    Bounded LRU of authenticated tokens with a time-to-live, local to the
+    process. Entries hold a copy of the user and the token's creation time,
+    not the token itself, so the key is only kept as the LRU key (a digest
+    of it by default). The signals in signals.py drop entries when a token is deleted
+    or reissued or its user changes; other worker processes notice such
+    changes once their entry expires.
+    """
+
+    def __init__(self, maxsize, timeout, hash_keys):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.hash_keys = hash_keys
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def cache_key(self, key):
+        """Tokens are stored under a digest of the key unless TOKEN_CACHE_HASH_KEYS is off."""
+        return hashlib.sha256(key.encode()).hexdigest() if self.hash_keys else key
+
+    def get(self, key):
+        """Return (user, token) for the key, or None if it is not cached."""
+        cache_key = self.cache_key(key)
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[cache_key]
+                return None
+            self.entries.move_to_end(cache_key)
+        _, user, created, using = entry
+        # Each request gets its own copy of the user; the token is rebuilt
+        # from the key the client sent, which the cache never holds
+        user = copy.copy(user)
+        token = Token.from_db(using, ['key', 'user_id', 'created'], [key, user.pk, created])
+        token.user = user
+        return user, token
+
+    def set(self, key, user, token):
+        cache_key = self.cache_key(key)
+        # Drop cached relations such as user.auth_token, which holds the key
+        user = copy.copy(user)
+        user._state.fields_cache = {}
+        with self.lock:
+            self.entries[cache_key] = (time.monotonic() + self.timeout, user, token.created, token._state.db)
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(self.cache_key(key), None)
+
+    def discard_user(self, user_pk):
+        with self.lock:
+            for cache_key in [k for k, (_, user, _, _) in self.entries.items() if user.pk == user_pk]:
+                del self.entries[cache_key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_token_cache = None
+
+
+def token_cache():
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenCache(
+            maxsize=getattr(settings, 'TOKEN_CACHE_SIZE', 1024),
+            timeout=getattr(settings, 'TOKEN_CACHE_TIMEOUT', 60),
+            hash_keys=getattr(settings, 'TOKEN_CACHE_HASH_KEYS', True),
+        )
+    return _token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the token query for recently seen tokens."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache().get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache().set(key, user, token)
+        return user, token
+
+
+async def aauthenticate_token(key):
+    """Return (user, token) for a valid token key, or None. Used by the async views."""
+    cached = token_cache().get(key)
+    if cached is not None:
+        return cached
+    token = await Token.objects.select_related('user').filter(key=key).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    token_cache().set(key, token.user, token)
+    return token.user, token
@@ -0,0 +1,201 @@
+import hashlib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router, transaction
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework.response import Response
+
+from .models import ListVersion
+from .routers import replica_reads_active
+
+VERSION_KEY = 'catalog:version'
+MODIFIED_KEY = 'catalog:modified'
+
+_batch = ContextVar('catalog_batch', default=False)
+
+
+def catalog_cache():
+    """Return the cache backend configured for the public catalog."""
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def catalog_state():
+    """Return the current (version, last modified timestamp) of the catalog."""
+    cache = catalog_cache()
+    state = cache.get_many([VERSION_KEY, MODIFIED_KEY])
+    if VERSION_KEY not in state:
+        _initialize(cache)
+        state = cache.get_many([VERSION_KEY, MODIFIED_KEY])
+    return state.get(VERSION_KEY, 0), state.get(MODIFIED_KEY, 0)
+
+
+async def acatalog_state():
+    """Async variant of catalog_state() for the async catalog views."""
+    cache = catalog_cache()
+    state = await cache.aget_many([VERSION_KEY, MODIFIED_KEY])
+    if VERSION_KEY not in state:
+        await cache.aadd(MODIFIED_KEY, int(time.time()), None)
+        await cache.aadd(VERSION_KEY, time.time_ns() // 1000, None)
+        state = await cache.aget_many([VERSION_KEY, MODIFIED_KEY])
+    return state.get(VERSION_KEY, 0), state.get(MODIFIED_KEY, 0)
+
+
+def _initialize(cache):
+    # Seed the version from the clock so that a lost counter never falls back
+    # to a version whose entries may still be cached.
+    cache.add(MODIFIED_KEY, int(time.time()), None)
+    cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response by moving to a new version."""
+    cache = catalog_cache()
+    cache.set(MODIFIED_KEY, int(time.time()), None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        _initialize(cache)
+
+
+@contextmanager
+def catalog_batch(using=None):
+    """
+    Group many catalog writes. Inside the block the MenuItem and Category
+    signal handlers skip their per-row work, so the code making the changes
+    keeps the search index in step itself, and the catalog version is
+    bumped once when the block exits and its writes have committed.
+    """
+    if _batch.get():
+        yield
+        return
+    token = _batch.set(True)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+        transaction.on_commit(bump_catalog_version, using=using)
+
+
+def in_catalog_batch():
+    return _batch.get()
+
+
+def catalog_cache_key(request, version):
+    """Build a cache key from the path, query parameters and catalog version."""
+    params = sorted(getattr(request, 'query_params', request.GET).lists())
+    raw = f'{request.get_host()}{request.path}?{params}'
+    return f'catalog:{version}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def format_etag(version, format='json'):
+    # Strong, so that the compression middleware can tell encodings apart
+    return f'"catalog-{version}-{format}"'
+
+
+def format_last_modified(modified):
+    return datetime.fromtimestamp(modified, tz=timezone.utc)
+
+
+def catalog_etag(request, *args, **kwargs):
+    version, _ = catalog_state()
+    return format_etag(version, request.accepted_renderer.format)
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    _, modified = catalog_state()
+    return format_last_modified(modified)
+
+
+class CatalogCacheMixin:
+    """
+    Serve list GETs from the catalog cache and answer conditional requests
+    from the catalog version, so unchanged responses never touch the database.
+    """
+
+    @method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        version, _ = catalog_state()
+        key = catalog_cache_key(request, version)
+        cache = catalog_cache()
+        data = cache.get(key)
+        if data is None:
+            data = self.list_data(request, *args, **kwargs)
+            cache.set(key, data)
+        return Response(data)
+
+    def list_data(self, request, *args, **kwargs):
+        """The serialized list, filtered and paginated by the view, bypassing the cache."""
+        return super().list(request, *args, **kwargs).data
+
+
+def list_version(name, user_id):
+    """
+    Return the version of a user's ``name`` list (their cart or orders): the
+    time in microseconds it last changed, or 0 if it never has. Read from the
+    primary, which has every committed change.
+    """
+    versions = ListVersion.objects.using(router.db_for_write(ListVersion))
+    return versions.filter(user_id=user_id, name=name).values_list('version', flat=True).first() or 0
+
+
+def bump_list_version(name, *user_ids, using=None):
+    """
+    Move the users' ``name`` lists to a new version as part of the current
+    transaction, so the new ETag becomes visible with the change itself.
+    Users are upserted in id order to take their row locks consistently.
+    """
+    if not user_ids:
+        return
+    using = using or router.db_for_write(ListVersion)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = qn(ListVersion._meta.db_table)
+    user, list_name, version = (qn(ListVersion._meta.get_field(field).column) for field in ('user', 'name', 'version'))
+    now = time.time_ns() // 1000
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} ({user}, {list_name}, {version}) VALUES (%s, %s, %s) '
+            f'ON CONFLICT ({user}, {list_name}) DO UPDATE SET {version} = CASE '
+            f'WHEN {table}.{version} < excluded.{version} THEN excluded.{version} ELSE {table}.{version} + 1 END',
+            [(user_id, name, now) for user_id in sorted(set(user_ids))],
+        )
+
+
+def list_etag(name):
+    """
+    Return a condition() etag_func for the requesting user's ``name`` list,
+    built from its version and the catalog's (its rows nest menu items) with
+    one indexed query.
+
+    For DATABASE_STICKY_SECONDS after a change, requests served from a
+    replica get no ETag: the replica may not have the change yet, and its
+    response must not be remembered under the new version.
+    """
+    def etag(request, *args, **kwargs):
+        version = list_version(name, request.user.pk)
+        if replica_reads_active() and time.time() - version / 1e6 < getattr(settings, 'DATABASE_STICKY_SECONDS', 10):
+            return None
+        catalog_version, _ = catalog_state()
+        raw = f'{request.user.pk}:{version}:{catalog_version}:{request.accepted_renderer.format}'
+        return f'"{name}-{hashlib.md5(raw.encode()).hexdigest()}"'
+    return etag
+
+
+class ListETagMixin:
+    """
+    Answer conditional GETs of a user's list from the ``etag_list`` version
+    (see list_etag()), so an unchanged list is neither queried nor serialized.
+    """
+    etag_list = None
+
+    def get(self, request, *args, **kwargs):
+        return condition(etag_func=list_etag(self.etag_list))(super().get)(request, *args, **kwargs)
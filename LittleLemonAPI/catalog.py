@@ -0,0 +1,212 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import ProtectedError
+
+from .cache import catalog_batch
+from .fast_serializers import RowSerializer
+from .models import Category, MenuItem
+from .pricing import refresh_cart_prices
+from .search import menu_search_index
+from .serializers import CategoryBulkSerializer, MenuItemBulkSerializer
+
+
+class BulkImportError(Exception):
+    """Raised when rows of a bulk import are invalid; nothing is written."""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid rows')
+        self.errors = errors
+
+
+class BulkDeleteError(Exception):
+    """Raised when rows cannot be deleted because other rows still refer to them."""
+
+
+def row_id(row):
+    try:
+        return int(row['id'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class BulkCatalog:
+    """
+    Create, update, delete and export catalog rows in batches.
+
+    Rows with an ``id`` update that row (only the fields given) or create it
+    with that id; rows without one are created. Rows are read from any
+    iterable in chunks of CATALOG_BATCH_SIZE, so a streamed import is never
+    held in memory. Each chunk is validated together: references are
+    checked with one query per chunk instead of one per row, and rows are
+    written with bulk_create and bulk_update. The whole import is one
+    transaction and bumps the catalog version once. When rows were created
+    with an id, the table's id sequence is moved past them on backends that
+    have one, so later inserts do not reuse those ids.
+    """
+    model = None
+    serializer_class = None
+
+    def __init__(self):
+        self.using = router.db_for_write(self.model)
+        self.batch_size = getattr(settings, 'CATALOG_BATCH_SIZE', 1000)
+
+    def save(self, rows):
+        """Write ``rows`` and return the number of rows created and updated."""
+        result = {'created': 0, 'updated': 0}
+        self.created_with_ids = False
+        with catalog_batch(self.using), transaction.atomic(using=self.using):
+            for offset, chunk in enumerate(chunks(rows, self.batch_size)):
+                created, updated = self.save_chunk(chunk, offset * self.batch_size + 1)
+                result['created'] += created
+                result['updated'] += updated
+            if self.created_with_ids:
+                self.reset_sequence()
+        return result
+
+    def reset_sequence(self):
+        """Move the table's id sequence past the largest id (a no-op on SQLite)."""
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(no_style(), [self.model])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def save_chunk(self, rows, first_row):
+        manager = self.model._default_manager.db_manager(self.using)
+        existing = manager.in_bulk([row_id(row) for row in rows if isinstance(row, dict)])
+
+        errors, valid = [], []
+        for number, row in enumerate(rows, first_row):
+            if not isinstance(row, dict):
+                errors.append({'row': number, 'errors': {'non_field_errors': ['Expected an object.']}})
+                continue
+            serializer = self.serializer_class(data=row, partial=row_id(row) in existing)
+            if serializer.is_valid():
+                valid.append((number, serializer.validated_data))
+            else:
+                errors.append({'row': number, 'errors': serializer.errors})
+        errors += self.check_references(valid)
+        if errors:
+            raise BulkImportError(sorted(errors, key=lambda error: error['row']))
+
+        created, updated, fields = [], [], set()
+        for _, data in valid:
+            instance = existing.get(data.get('id'))
+            if instance is None:
+                created.append(self.model(**data))
+                self.created_with_ids |= data.get('id') is not None
+                continue
+            for name, value in data.items():
+                setattr(instance, name, value)
+            fields.update(name for name in data if name != 'id')
+            updated.append(instance)
+        try:
+            manager.bulk_create(created, batch_size=self.batch_size)
+            if updated and fields:
+                manager.bulk_update(updated, sorted(fields), batch_size=self.batch_size)
+        except IntegrityError as exc:
+            raise BulkImportError([{'row': first_row, 'errors': {'non_field_errors': [str(exc)]}}])
+        self.saved(created + updated)
+        return len(created), len(updated)
+
+    def check_references(self, valid):
+        """Return errors for validated rows that refer to missing or conflicting rows."""
+        return []
+
+    def saved(self, instances):
+        pass
+
+    def delete(self, ids):
+        """Delete the rows with the given ids and return how many were deleted."""
+        ids = list(ids)
+        with catalog_batch(self.using), transaction.atomic(using=self.using):
+            queryset = self.model._default_manager.db_manager(self.using).filter(pk__in=ids)
+            try:
+                deleted = queryset.delete()[1].get(self.model._meta.label, 0)
+            except ProtectedError as exc:
+                raise BulkDeleteError(str(exc.args[0]))
+            self.deleted(ids)
+        return deleted
+
+    def deleted(self, ids):
+        pass
+
+    def export(self):
+        """Yield every row as the dict an import accepts, reading the table in chunks."""
+        rows, queryset = self.export_query()
+        for row in queryset.iterator(chunk_size=self.batch_size):
+            yield rows.build(row)
+
+    async def aexport(self):
+        rows, queryset = self.export_query()
+        async for row in queryset.aiterator(chunk_size=self.batch_size):
+            yield rows.build(row)
+
+    def export_query(self):
+        rows = RowSerializer(self.serializer_class())
+        return rows, rows.values(self.model._default_manager.db_manager(self.using).order_by('pk'))
+
+    @property
+    def fields(self):
+        return list(self.serializer_class().fields)
+
+
+class BulkMenuItems(BulkCatalog):
+    model = MenuItem
+    serializer_class = MenuItemBulkSerializer
+
+    def check_references(self, valid):
+        category_ids = {data['category_id'] for _, data in valid if 'category_id' in data}
+        found = set(Category.objects.using(self.using).filter(pk__in=category_ids).values_list('pk', flat=True))
+        return [
+            {'row': number, 'errors': {'category_id': [f'Invalid pk "{data["category_id"]}" - object does not exist.']}}
+            for number, data in valid if 'category_id' in data and data['category_id'] not in found
+        ]
+
+    def saved(self, instances):
+        index = menu_search_index(self.using)
+        if index is not None:
+            index.index(instances)
+        # Only updated rows were loaded with a price; re-price the carts of those whose price changed
+        repriced = [item.pk for item in instances
+                    if getattr(item, '_loaded_price', item.price) != item.price]
+        if repriced:
+            refresh_cart_prices(repriced, using=self.using)
+        for item in instances:
+            item._loaded_price = item.price
+
+    def deleted(self, ids):
+        index = menu_search_index(self.using)
+        if index is not None:
+            index.remove(ids)
+
+
+class BulkCategories(BulkCatalog):
+    model = Category
+    serializer_class = CategoryBulkSerializer
+
+    def check_references(self, valid):
+        slugs = {}
+        errors = []
+        for number, data in valid:
+            if 'slug' not in data:
+                continue
+            if data['slug'] in slugs:
+                errors.append({'row': number, 'errors': {'slug': ['Duplicate slug in this batch.']}})
+            slugs[data['slug']] = data.get('id')
+        taken = Category.objects.using(self.using).filter(slug__in=slugs).values_list('slug', 'pk')
+        conflicts = {slug for slug, pk in taken if pk != slugs[slug]}
+        errors += [
+            {'row': number, 'errors': {'slug': ['category with this slug already exists.']}}
+            for number, data in valid if data.get('slug') in conflicts
+        ]
+        return errors
@@ -0,0 +1,220 @@
+import re
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = re.compile(r'^(text/|application/(json|x-ndjson|javascript|xml)|application/[\w.+-]+\+(json|xml))')
+
+DEFAULT_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+
+
+class GzipEncoder:
+    def __init__(self, level):
+        # wbits=31 writes a gzip header; its mtime is 0, so output is reproducible
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+ENCODERS = {'gzip': GzipEncoder}
+if brotli is not None:
+    ENCODERS['br'] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS['zstd'] = ZstdEncoder
+
+
+def available_encodings():
+    """COMPRESSION_ENCODINGS in order of preference, without those whose library is not installed."""
+    return [name for name in getattr(settings, 'COMPRESSION_ENCODINGS', ['zstd', 'br', 'gzip']) if name in ENCODERS]
+
+
+def negotiate(accept_encoding, encodings):
+    """
+    Pick the content coding for an Accept-Encoding header: the one with the
+    highest q-value, ties going to the first of ``encodings``. Returns None
+    when the client accepts none of them.
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    best, best_quality = None, 0.0
+    for coding in encodings:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def encoder(coding):
+    levels = {**DEFAULT_LEVELS, **getattr(settings, 'COMPRESSION_LEVELS', {})}
+    return ENCODERS[coding](levels[coding])
+
+
+def compress(coding, data):
+    compressor = encoder(coding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(coding, chunks):
+    # Flush after every chunk so that streamed rows and events reach the client as they are produced
+    compressor = encoder(coding)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(coding, chunks):
+    compressor = encoder(coding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def encoded_etag(etag, coding):
+    """Give a strong ETag a suffix per content coding, since each coding is a different representation."""
+    if not etag or etag.startswith('W/') or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{coding}"'
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best content coding the client accepts:
+    zstd or brotli when their libraries (zstandard, brotli) are installed,
+    and gzip. Only textual content types of at least COMPRESSION_MIN_SIZE
+    bytes are compressed; streaming responses, sync or async, are
+    compressed chunk by chunk.
+
+    Strong ETags get a ``-<coding>`` suffix on compressed responses. The
+    suffix is removed from If-None-Match before the view compares it, and
+    put back on 304 responses, so views only ever see their own ETags.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        matches = self.process_request(request)
+        return self.process_response(request, self.get_response(request), matches)
+
+    async def __acall__(self, request):
+        matches = self.process_request(request)
+        return self.process_response(request, await self.get_response(request), matches)
+
+    def process_request(self, request):
+        """Strip coding suffixes from If-None-Match; return the original tags by their stripped form."""
+        header = request.META.get('HTTP_IF_NONE_MATCH')
+        if not header:
+            return {}
+        suffixes = tuple(f'-{coding}"' for coding in ENCODERS)
+        tags = [tag.strip() for tag in header.split(',')]
+        matches = {}
+        for i, tag in enumerate(tags):
+            if not tag.startswith('W/') and tag.endswith(suffixes):
+                tags[i] = tag[:tag.rindex('-')] + '"'
+                matches[tags[i]] = tag
+        if matches:
+            request.META['HTTP_IF_NONE_MATCH'] = ', '.join(tags)
+        return matches
+
+    def process_response(self, request, response, matches):
+        if response.status_code == 304:
+            etag = response.get('ETag')
+            if etag in matches:
+                response['ETag'] = matches[etag]
+            return response
+        if response.has_header('Content-Encoding') or not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), available_encodings())
+        if coding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(coding, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(coding, response.streaming_content)
+            response.headers.pop('Content-Length', None)
+        else:
+            compressed = compress(coding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        if response.has_header('ETag'):
+            response['ETag'] = encoded_etag(response['ETag'], coding)
+        response['Content-Encoding'] = coding
+        return response
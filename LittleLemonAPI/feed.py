@@ -0,0 +1,178 @@
+import asyncio
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router, transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .fast_serializers import RowSerializer
+from .models import Order, OrderChange
+from .permissions import DELIVERY_CREW, MANAGER
+from .serializers import OrderChangeSerializer
+
+HEAD_KEY = 'orders:feed:head'
+# Advisory lock key that orders appends to the feed on PostgreSQL
+FEED_LOCK_KEY = 0x4C4C4644
+
+
+def feed_cache():
+    """Return the cache through which new feed entries are announced."""
+    return caches[getattr(settings, 'ORDER_FEED_CACHE_ALIAS', 'default')]
+
+
+def record_order_changes(changes, using=None):
+    """
+    Append entries to the order change feed.
+
+    ``changes`` are ``(order, previous delivery crew id, placed)`` tuples
+    with the orders' new state. The entries are written with one INSERT and
+    announced to waiting clients once the transaction commits.
+    """
+    using = using or router.db_for_write(OrderChange)
+    with transaction.atomic(using=using, savepoint=False):
+        lock_feed(using)
+        entries = OrderChange.objects.using(using).bulk_create([
+            OrderChange(order_id=order.pk, placed=placed, status=order.status,
+                        delivery_crew_id=order.delivery_crew_id, previous_delivery_crew_id=previous)
+            for order, previous, placed in changes
+        ])
+    if entries:
+        announce(max(entry.pk for entry in entries), using)
+    return entries
+
+
+def record_assignments(order_ids, using=None):
+    """
+    Append entries for orders that were just given a delivery crew in bulk,
+    copying their new state with a single INSERT ... SELECT.
+    """
+    using = using or router.db_for_write(OrderChange)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(OrderChange._meta.get_field(name).column) for name in
+                        ['order', 'placed', 'status', 'delivery_crew', 'previous_delivery_crew'])
+    order_pk, status, delivery_crew = (qn(Order._meta.get_field(name).column) for name in ['id', 'status', 'delivery_crew'])
+    placeholders = ', '.join(['%s'] * len(order_ids))
+    sql = (
+        f'INSERT INTO {qn(OrderChange._meta.db_table)} ({columns}) '
+        f'SELECT {order_pk}, %s, {status}, {delivery_crew}, NULL FROM {qn(Order._meta.db_table)} '
+        f'WHERE {order_pk} IN ({placeholders}) ORDER BY {order_pk}'
+    )
+    with transaction.atomic(using=using, savepoint=False), connection.cursor() as cursor:
+        lock_feed(using)
+        cursor.execute(sql, [False, *order_ids])
+    announce(latest_sequence(using), using)
+
+
+def lock_feed(using):
+    """
+    Serialize appends to the feed until the current transaction ends, so
+    entry ids are handed out in commit order. A client that resumes after
+    the last id it has seen then cannot miss an entry that commits later
+    with a lower id.
+
+    PostgreSQL hands out sequence values as soon as they are asked for, so
+    a transaction-level advisory lock is taken first. SQLite allows one
+    writer at a time, which gives the same order without a lock.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [FEED_LOCK_KEY])
+
+
+def announce(head, using=None):
+    """Wake waiting feed clients once the transaction that wrote up to ``head`` commits."""
+    transaction.on_commit(lambda: feed_cache().set(HEAD_KEY, head, None), using=using)
+
+
+def visible_changes(user, roles):
+    """Managers see every order; delivery crew the orders they hold or held; customers their own."""
+    changes = OrderChange.objects.all()
+    if MANAGER in roles:
+        return changes
+    if DELIVERY_CREW in roles:
+        return changes.filter(Q(delivery_crew=user) | Q(previous_delivery_crew=user))
+    return changes.filter(order__user=user)
+
+
+def feed_params(params):
+    """
+    Parse ``since``, ``timeout`` and ``limit`` from the query string.
+
+    ``since`` is None when not given; ``timeout`` is capped at
+    ORDER_FEED_MAX_WAIT and ``limit`` at ORDER_FEED_PAGE_SIZE.
+    """
+    page_size = getattr(settings, 'ORDER_FEED_PAGE_SIZE', 100)
+    max_wait = getattr(settings, 'ORDER_FEED_MAX_WAIT', 25)
+    try:
+        since = int(params['since']) if 'since' in params else None
+        timeout = min(float(params.get('timeout', 0)), max_wait)
+        limit = min(int(params.get('limit', page_size)), page_size)
+    except ValueError:
+        raise ValidationError({'detail': 'since, timeout and limit must be numbers.'})
+    if (since is not None and since < 0) or not timeout >= 0 or limit < 1:
+        raise ValidationError({'detail': 'since and timeout must not be negative and limit must be positive.'})
+    return since, timeout, limit
+
+
+@lru_cache(maxsize=None)
+def change_serializer():
+    return RowSerializer(OrderChangeSerializer())
+
+
+def changes_after(user, roles, since, limit):
+    # Ids follow commit order (see lock_feed), so ``pk > since`` skips nothing
+    return visible_changes(user, roles).filter(pk__gt=since).order_by('pk')[:limit]
+
+
+def feed_page(user, roles, since, limit):
+    rows = change_serializer()
+    return rows.serialize(rows.values(changes_after(user, roles, since, limit)))
+
+
+async def afeed_page(user, roles, since, limit):
+    rows = change_serializer()
+    return await rows.aserialize(rows.values(changes_after(user, roles, since, limit)))
+
+
+def feed_response_data(since, results):
+    """The cursor to resume from is the last entry returned, or ``since`` if there were none."""
+    return {'cursor': results[-1]['seq'] if results else since, 'results': results}
+
+
+def latest_sequence(using=None):
+    entry = OrderChange.objects.using(using).order_by('-pk').values_list('pk', flat=True).first()
+    return entry or 0
+
+
+async def alatest_sequence():
+    entry = await OrderChange.objects.order_by('-pk').values_list('pk', flat=True).afirst()
+    return entry or 0
+
+
+async def await_head_change(head, timeout):
+    """
+    Wait until the announced feed head differs from ``head``. Returns the
+    new head, or ``head`` when ``timeout`` seconds pass first.
+
+    Waiting clients only read one cache key every ORDER_FEED_POLL_INTERVAL
+    seconds; the database is queried once something was announced. With a
+    per-process cache, entries written by other processes are only noticed
+    by the next request, so use a shared cache when running several workers.
+    """
+    cache = feed_cache()
+    interval = getattr(settings, 'ORDER_FEED_POLL_INTERVAL', 0.2)
+    deadline = time.monotonic() + timeout
+    while True:
+        current = await cache.aget(HEAD_KEY)
+        if current != head:
+            return current
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return head
+        await asyncio.sleep(min(interval, remaining))
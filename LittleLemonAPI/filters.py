@@ -0,0 +1,9 @@
+def declared_lookups(view_class):
+    """Return the filter lookups a view declares, e.g. ['category', 'price__gt']."""
+    fields = view_class.filterset_fields
+    if not isinstance(fields, dict):
+        fields = {name: ['exact'] for name in fields}
+    return [
+        name if lookup == 'exact' else f'{name}__{lookup}'
+        for name, lookups in fields.items() for lookup in lookups
+    ]
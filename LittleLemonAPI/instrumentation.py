@@ -0,0 +1,248 @@
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Timings collected for one sampled request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+        self.throttle_time = 0.0
+        self.statements = {}
+
+    @property
+    def duplicate_queries(self):
+        """Number of queries that repeated an earlier statement with the same parameters."""
+        return self.queries - len(self.statements)
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - start
+            self.queries += 1
+            key = (sql, repr(params))
+            self.statements[key] = self.statements.get(key, 0) + 1
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper installed on every connection. It passes
+    straight through unless the current request is being sampled.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(attribute):
+    """Add the time spent in the block to ``attribute`` of the current request's metrics."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(metrics, attribute, getattr(metrics, attribute) + time.perf_counter() - start)
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timed('serializer_time'):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Record the time spent producing ``serializer.data``, for single objects and lists."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = cls.__dict__.get('Meta')
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+    @property
+    def data(self):
+        with timed('serializer_time'):
+            return super().data
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labelnames = labelnames
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self.lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self.series.items()]
+        for labels, counts, total in sorted(series):
+            label_text = ','.join(f'{name}="{escape(value)}"' for name, value in zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}'
+            yield f'{self.name}_sum{{{label_text}}} {total}'
+            yield f'{self.name}_count{{{label_text}}} {cumulative}'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_DURATION = Histogram(
+    'littlelemon_request_duration_seconds', 'Time spent handling the request.',
+    DURATION_BUCKETS, ('route', 'method'))
+QUERY_COUNT = Histogram(
+    'littlelemon_db_queries', 'Database queries per sampled request.',
+    QUERY_COUNT_BUCKETS, ('route',))
+QUERY_DURATION = Histogram(
+    'littlelemon_db_duration_seconds', 'Time spent in database queries per sampled request.',
+    DURATION_BUCKETS, ('route',))
+DUPLICATE_QUERIES = Histogram(
+    'littlelemon_db_duplicate_queries', 'Repeated identical queries per sampled request.',
+    QUERY_COUNT_BUCKETS, ('route',))
+SERIALIZER_DURATION = Histogram(
+    'littlelemon_serializer_duration_seconds', 'Time spent serializing response data per sampled request.',
+    DURATION_BUCKETS, ('route',))
+THROTTLE_DURATION = Histogram(
+    'littlelemon_throttle_duration_seconds', 'Time spent checking rate throttles per sampled request.',
+    DURATION_BUCKETS, ('route',))
+
+METRICS = [REQUEST_DURATION, QUERY_COUNT, QUERY_DURATION, DUPLICATE_QUERIES, SERIALIZER_DURATION, THROTTLE_DURATION]
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.route
+
+
+class InstrumentationMiddleware:
+    """
+    Record the wall time of every request in a histogram per route, and for
+    a sample of requests (``INSTRUMENTATION_SAMPLE_RATE``, 0 to 1) also the
+    database query count and time, repeated identical queries, serializer
+    time and throttle time. Sampled responses carry a Server-Timing header.
+
+    Unsampled requests only pay for two clock reads and one histogram
+    update; the query wrapper and timers do nothing unless the request is
+    sampled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    @staticmethod
+    def start():
+        metrics = token = None
+        rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0)
+        if rate and random.random() < rate:
+            metrics = RequestMetrics()
+            token = _current.set(metrics)
+        return metrics, token, time.perf_counter()
+
+    @staticmethod
+    def finish(request, response, metrics, start):
+        elapsed = time.perf_counter() - start
+        route = route_name(request)
+        REQUEST_DURATION.observe(elapsed, route, request.method)
+        if metrics is None:
+            return response
+
+        QUERY_COUNT.observe(metrics.queries, route)
+        QUERY_DURATION.observe(metrics.query_time, route)
+        DUPLICATE_QUERIES.observe(metrics.duplicate_queries, route)
+        SERIALIZER_DURATION.observe(metrics.serializer_time, route)
+        THROTTLE_DURATION.observe(metrics.throttle_time, route)
+        if metrics.duplicate_queries:
+            repeated = max(metrics.statements.items(), key=lambda item: item[1])
+            logger.warning('%s %s issued %d duplicate queries; most repeated (%dx): %s',
+                           request.method, request.path, metrics.duplicate_queries, repeated[1], repeated[0][0])
+
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={elapsed * 1000:.2f}',
+            f'db;dur={metrics.query_time * 1000:.2f};desc="{metrics.queries} queries, '
+            f'{metrics.duplicate_queries} duplicate"',
+            f'serializer;dur={metrics.serializer_time * 1000:.2f}',
+            f'throttle;dur={metrics.throttle_time * 1000:.2f}',
+        ])
+        return response
+
+
+def metrics_view(request):
+    """Prometheus text exposition of this process's metrics, for INTERNAL_IPS and staff users."""
+    user = getattr(request, 'user', None)
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS and not (user and user.is_staff):
+        return HttpResponseForbidden()
+    lines = [line for metric in METRICS for line in metric.collect()]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
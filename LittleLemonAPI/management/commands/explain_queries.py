@@ -0,0 +1,94 @@
+import re
+from itertools import combinations
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from rest_framework.test import APIRequestFactory
+
+from LittleLemonAPI import views
+from LittleLemonAPI.filters import declared_lookups
+
+# Views whose declared filterset_fields and ordering_fields are audited
+AUDITED_VIEWS = [views.MenuItemView, views.OrderView]
+
+FULL_SCAN = re.compile(r'^.*\bSCAN (?!.*\bUSING\b)|Seq Scan on', re.MULTILINE)
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR ORDER BY|\bSort\b')
+
+
+def sample_value(field):
+    if isinstance(field, models.BooleanField):
+        return True
+    if isinstance(field, models.DecimalField):
+        return '1.00'
+    if isinstance(field, models.DateField):
+        return '2024-01-01'
+    return 1
+
+
+def orderings(view_class):
+    """Return every ordering a view accepts, including its default."""
+    result = [list(view_class.ordering)]
+    for name in view_class.ordering_fields:
+        result += [[name], [f'-{name}']]
+    return result
+
+
+def base_queryset(view_class, user):
+    view = view_class()
+    request = view.initialize_request(APIRequestFactory().get('/'))
+    request.user = user
+    view.request, view.args, view.kwargs, view.format_kwarg = request, (), {}, None
+    return view.get_queryset()
+
+
+def audit(view_class, user):
+    """Yield (label, queryset) for every filter subset and ordering of a view."""
+    queryset = base_queryset(view_class, user)
+    model = queryset.model
+    params = declared_lookups(view_class)
+    for size in range(len(params) + 1):
+        for chosen in combinations(params, size):
+            lookups = {
+                param: sample_value(model._meta.get_field(param.split('__')[0]))
+                for param in chosen
+            }
+            for ordering in orderings(view_class):
+                desc = ordering[0].startswith('-')
+                tiebreak = '-pk' if desc else 'pk'
+                qs = queryset.filter(**lookups).order_by(*ordering, tiebreak)[:100]
+                label = '&'.join([f'{k}={v}' for k, v in lookups.items()] + [f"ordering={','.join(ordering)}"])
+                yield f'{view_class.__name__} ?{label}', qs
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN for every filter/ordering combination declared by the list '
+        'views and flag filtered queries that scan and sort the whole table.'
+    )
+
+    def handle(self, *args, **options):
+        user = User(pk=1, username='explain')
+        full_scans = []
+        for view_class in AUDITED_VIEWS:
+            for label, queryset in audit(view_class, user):
+                plan = queryset.explain()
+                notes = []
+                scan, sort = FULL_SCAN.search(plan), TEMP_SORT.search(plan)
+                if scan and sort and queryset.query.where:
+                    # Neither the filter nor the ordering is served by an index
+                    notes.append('FULL SCAN')
+                    full_scans.append(label)
+                elif scan:
+                    # A table scan in ORDER BY order stops once the page is full
+                    notes.append('ordered scan')
+                elif sort:
+                    notes.append('sort')
+                self.stdout.write(f"{label}: {', '.join(notes) or 'ok'}")
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan)
+
+        if full_scans:
+            raise CommandError(
+                f'{len(full_scans)} filtered queries use a full table scan:\n' + '\n'.join(full_scans))
+        self.stdout.write(self.style.SUCCESS('No full table scans found.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from LittleLemonAPI.assignment import sync_workloads
+from LittleLemonAPI.models import CrewWorkload
+
+
+class Command(BaseCommand):
+    help = 'Recount the open orders of every delivery crew member from the Order table.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            sync_workloads()
+        self.stdout.write(self.style.SUCCESS(f'Recounted {CrewWorkload.objects.count()} delivery crew workloads.'))
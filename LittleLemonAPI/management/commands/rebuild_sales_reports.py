@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.reporting import rebuild_in_chunks
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollups from the Order and OrderItem tables, a chunk of days at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--chunk-days', type=int, default=getattr(settings, 'REPORTS_REBUILD_CHUNK_DAYS', 31))
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1.')
+        days = 0
+        for start, end in rebuild_in_chunks(options['start'], options['end'], options['chunk_days']):
+            days += (end - start).days + 1
+            self.stdout.write(f'Rebuilt {start} to {end}')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the sales reports for {days} days.'))
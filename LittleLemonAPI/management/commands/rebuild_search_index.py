@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from LittleLemonAPI.models import MenuItem
+from LittleLemonAPI.search import menu_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the menu item full-text search index from the MenuItem table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        index = menu_search_index()
+        if index is None:
+            raise CommandError('The configured database does not support the menu search index.')
+
+        batch_size = options['batch_size']
+        total = 0
+        with transaction.atomic():
+            index.clear()
+            last_pk = 0
+            while True:
+                batch = list(MenuItem.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'title')[:batch_size])
+                if not batch:
+                    break
+                index.index(batch)
+                total += len(batch)
+                last_pk = batch[-1].pk
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} menu items.'))
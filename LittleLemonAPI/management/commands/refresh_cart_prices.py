@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.cache import bump_catalog_version
+from LittleLemonAPI.pricing import refresh_cart_prices
+
+
+class Command(BaseCommand):
+    help = 'Re-price cart rows from the current menu prices, e.g. after prices were changed outside the API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('menuitem_ids', nargs='*', type=int, help='Only these menu items (default: all).')
+
+    def handle(self, *args, **options):
+        count = refresh_cart_prices(options['menuitem_ids'] or None)
+        # Cart ETags include the catalog version
+        if count:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Re-priced {count} cart rows.'))
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from LittleLemonAPI.tasks import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run tasks from the outbox, polling for new ones, or only the ones due now with --once.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due.')
+        parser.add_argument('--interval', type=float, default=getattr(settings, 'TASK_POLL_INTERVAL', 5))
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_pending(options['batch_size'])
+            if count:
+                self.stdout.write(f'Ran {count} tasks.')
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
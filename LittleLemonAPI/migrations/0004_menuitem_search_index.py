@@ -0,0 +1,40 @@
+from django.db import migrations
+
+TABLE = 'LittleLemonAPI_menuitem_search'
+MENUITEM_TABLE = 'LittleLemonAPI_menuitem'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    qn = schema_editor.connection.ops.quote_name
+    if vendor == 'sqlite':
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {qn(TABLE)} USING fts5(title, tokenize='trigram')")
+        schema_editor.execute(
+            f'INSERT INTO {qn(TABLE)} (rowid, title) SELECT id, title FROM {qn(MENUITEM_TABLE)}')
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE TABLE {qn(TABLE)} ('
+            f'menuitem_id bigint PRIMARY KEY REFERENCES {qn(MENUITEM_TABLE)} (id) ON DELETE CASCADE, '
+            f'title text NOT NULL, document tsvector NOT NULL)')
+        schema_editor.execute(f'CREATE INDEX menuitem_search_document_idx ON {qn(TABLE)} USING GIN (document)')
+        schema_editor.execute(f'CREATE INDEX menuitem_search_title_trgm_idx ON {qn(TABLE)} USING GIN (title gin_trgm_ops)')
+        schema_editor.execute(
+            f"INSERT INTO {qn(TABLE)} (menuitem_id, title, document) "
+            f"SELECT id, title, to_tsvector('simple', title) FROM {qn(MENUITEM_TABLE)}")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {schema_editor.connection.ops.quote_name(TABLE)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0003_filter_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_workloads(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    Order = apps.get_model('LittleLemonAPI', 'Order')
+    CrewWorkload = apps.get_model('LittleLemonAPI', 'CrewWorkload')
+    using = schema_editor.connection.alias
+    crew = User.objects.using(using).filter(groups__name='Delivery crew').values_list('pk', flat=True)
+    counts = dict(
+        Order.objects.using(using).filter(status=False, delivery_crew__in=crew)
+        .values('delivery_crew').annotate(count=Count('pk')).values_list('delivery_crew', 'count')
+    )
+    CrewWorkload.objects.using(using).bulk_create(
+        [CrewWorkload(user_id=pk, open_orders=counts.get(pk, 0)) for pk in crew])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0006_order_change_feed'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrewWorkload',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='crew_workload', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_orders', models.PositiveIntegerField(default=0)),
+                ('last_assigned', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('delivery_crew', None), ('status', False)), fields=['id'], name='order_unassigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='crewworkload',
+            index=models.Index(fields=['open_orders', 'user'], name='crewworkload_open_orders_idx'),
+        ),
+        migrations.RunPython(backfill_workloads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:00
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_sales(apps, schema_editor):
+    Order = apps.get_model('LittleLemonAPI', 'Order')
+    OrderItem = apps.get_model('LittleLemonAPI', 'OrderItem')
+    DailySales = apps.get_model('LittleLemonAPI', 'DailySales')
+    DailyMenuItemSales = apps.get_model('LittleLemonAPI', 'DailyMenuItemSales')
+    qn = schema_editor.connection.ops.quote_name
+
+    def column(model, name):
+        return qn(model._meta.get_field(name).column)
+
+    order_date, order_pk = column(Order, 'date'), column(Order, 'id')
+    schema_editor.execute(
+        f'INSERT INTO {qn(DailySales._meta.db_table)} '
+        f'({", ".join(column(DailySales, name) for name in ["date", "orders", "items", "revenue"])}) '
+        f'SELECT {order_date}, COUNT(*), SUM({column(Order, "items_count")}), ROUND(SUM({column(Order, "total")}), 2) '
+        f'FROM {qn(Order._meta.db_table)} GROUP BY {order_date}'
+    )
+    schema_editor.execute(
+        f'INSERT INTO {qn(DailyMenuItemSales._meta.db_table)} '
+        f'({", ".join(column(DailyMenuItemSales, name) for name in ["date", "menuitem", "orders", "quantity", "revenue"])}) '
+        f'SELECT o.{order_date}, i.{column(OrderItem, "menuitem")}, COUNT(*), SUM(i.{column(OrderItem, "quantity")}), '
+        f'ROUND(SUM(i.{column(OrderItem, "price")}), 2) '
+        f'FROM {qn(OrderItem._meta.db_table)} i JOIN {qn(Order._meta.db_table)} o ON o.{order_pk} = i.{column(OrderItem, "order")} '
+        f'GROUP BY o.{order_date}, i.{column(OrderItem, "menuitem")}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0007_crew_workload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyMenuItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('menuitem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='LittleLemonAPI.menuitem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'menuitem'), name='dailymenuitemsales_date_menuitem_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_sales, migrations.RunPython.noop),
+    ]
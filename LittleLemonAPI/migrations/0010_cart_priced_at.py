@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0009_outbox_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='priced_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
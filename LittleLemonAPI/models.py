@@ -1,4 +1,8 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 class Category(models.Model):
@@ -14,6 +18,26 @@ class MenuItem(models.Model):
     featured = models.BooleanField(db_index=True)
     category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name="menu_items")
 
+    class Meta:
+        # Keyset pagination orders by one of the ordering fields plus the id
+        indexes = [
+            models.Index(fields=['price', 'id'], name='menuitem_price_id_idx'),
+            models.Index(fields=['featured', 'id'], name='menuitem_featured_id_idx'),
+            # Category filter combined with a price range or price/featured ordering
+            models.Index(fields=['category', 'price'], name='menuitem_category_price_idx'),
+            models.Index(fields=['category', 'featured'], name='menuitem_category_feat_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_price = instance.__dict__.get('price')
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_price = self.__dict__.get('price')
+
     def __str__(self):
         return self.title
 
@@ -23,20 +47,80 @@ class Cart(models.Model):
     quantity = models.SmallIntegerField(default=1)
     unit_price = models.DecimalField(max_digits=8, decimal_places=2)
     price = models.DecimalField(max_digits=8, decimal_places=2)
+    # When unit_price was copied from the menu item; starts the price lock
+    priced_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         unique_together = ('menuitem', 'user')
 
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Load order items, their menu items and categories in a fixed number of queries."""
+        return self.prefetch_related(
+            models.Prefetch(
+                'order_items',
+                queryset=OrderItem.objects.select_related('menuitem__category'),
+            )
+        )
+
+    def refresh_totals(self):
+        """Recompute items_count and total from the order items with a single UPDATE."""
+        items = OrderItem.objects.filter(order=models.OuterRef('pk')).order_by().values('order')
+        return self.update(
+            items_count=Coalesce(models.Subquery(items.annotate(count=models.Sum('quantity')).values('count')), 0),
+            total=Coalesce(
+                models.Subquery(items.annotate(total=models.Sum('price')).values('total')),
+                models.Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=8, decimal_places=2),
+            ),
+        )
+
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
     delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="delivery_crew", null=True, blank=True)
     status = models.BooleanField(db_index=True, default=False)
     total = models.DecimalField(max_digits=8, decimal_places=2)
+    # Total quantity over the order's items, kept in step with total
+    items_count = models.PositiveIntegerField(default=0)
     date = models.DateField(db_index=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        # Order listings are always scoped to a user; these back keyset pagination
+        indexes = [
+            models.Index(fields=['user', 'date', 'id'], name='order_user_date_id_idx'),
+            models.Index(fields=['user', 'total', 'id'], name='order_user_total_id_idx'),
+            # Status filter within a user's orders, ordered by date
+            models.Index(fields=['user', 'status', 'date'], name='order_user_status_date_idx'),
+            # Orders waiting for a delivery crew, in the order they are assigned
+            models.Index(fields=['id'], condition=models.Q(status=False, delivery_crew=None),
+                         name='order_unassigned_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._feed_state = instance.feed_state()
+        instance._report_state = instance.report_state()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._feed_state = self.feed_state()
+        self._report_state = self.report_state()
+
+    def feed_state(self):
+        """The fields whose changes are published on the order change feed."""
+        return self.__dict__.get('status'), self.__dict__.get('delivery_crew_id')
+
+    def report_state(self):
+        """The fields the sales reports are aggregated from."""
+        return self.__dict__.get('date'), self.__dict__.get('total'), self.__dict__.get('items_count')
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="order_items")
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -49,3 +133,121 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.menuitem.title} (x{self.quantity})"
+
+class OrderChange(models.Model):
+    """
+    An entry of the order change feed, appended when an order is placed or
+    its status or delivery crew changes. The id is the feed's sequence number;
+    ids are handed out in commit order (see feed.lock_feed).
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="changes")
+    placed = models.BooleanField(default=False)
+    status = models.BooleanField()
+    delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="+", null=True)
+    # Lets a crew member see that an order was taken off them
+    previous_delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="+", null=True)
+
+    def __str__(self):
+        return f"Change {self.id} of order {self.order_id}"
+
+
+class ListVersion(models.Model):
+    """
+    The version of a user's cart or order list, moved forward in the same
+    transaction as every change to the list. The list ETags are built from
+    it, so every worker sees a change as soon as it commits.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    name = models.CharField(max_length=20)
+    # Microseconds since the epoch of the last change, kept increasing
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='listversion_user_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.name}: {self.version}"
+
+
+class AssignmentPolicy(models.TextChoices):
+    LEAST_LOADED = 'least_loaded'
+    ROUND_ROBIN = 'round_robin'
+
+
+class CrewWorkload(models.Model):
+    """
+    One row per delivery crew member with the number of open (undelivered)
+    orders assigned to them, kept up to date as orders change hands.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="crew_workload")
+    open_orders = models.PositiveIntegerField(default=0)
+    # Increases with every assignment; round-robin starts from the lowest
+    last_assigned = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['open_orders', 'user'], name='crewworkload_open_orders_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.open_orders} open orders"
+
+
+class DailySales(models.Model):
+    """Orders placed on a day, with their item count and revenue."""
+    date = models.DateField(primary_key=True)
+    orders = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    def __str__(self):
+        return f"{self.date}: {self.orders} orders"
+
+
+class DailyMenuItemSales(models.Model):
+    """Quantity and revenue of a menu item over the orders placed on a day."""
+    date = models.DateField()
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="+")
+    orders = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'menuitem'], name='dailymenuitemsales_date_menuitem_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.quantity} x {self.menuitem_id}"
+
+
+class TaskStatus(models.TextChoices):
+    PENDING = 'pending'
+    FAILED = 'failed'
+
+
+class OutboxTask(models.Model):
+    """
+    A background task, written in the same transaction as the change that
+    calls for it and deleted once it has run. ``name`` is the dotted path of
+    the function to call with ``payload``.
+    """
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=TaskStatus.choices, default=TaskStatus.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Set while a worker runs the task; another worker may claim it once this passes
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_after', 'id'], condition=models.Q(status='pending'), name='outboxtask_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
@@ -0,0 +1,122 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination that switches to keyset (cursor) pagination when
+    the request carries a ``cursor`` parameter; pass an empty ``cursor=`` to
+    fetch the first page.
+
+    Keyset pages are located with a WHERE clause on the ordering columns
+    instead of an OFFSET, and no COUNT query is issued, so every page costs
+    the same no matter how deep it is. The ordering comes from the view's
+    OrderingFilter and is made unique by appending the primary key. The
+    ordering fields must not be nullable.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        self.keys = self.get_keys(request, queryset, view)
+        values, reverse = self.decode_cursor(request)
+
+        keys = [(name, not desc) for name, desc in self.keys] if reverse else self.keys
+        queryset = queryset.order_by(*[f'-{name}' if desc else name for name, desc in keys])
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.after(keys, values))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = bool(rows), has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page_rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page_rows:
+            return None
+        return self.encode_cursor(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.page_rows:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page_rows[0], reverse=True)
+
+    def get_keys(self, request, queryset, view):
+        ordering = OrderingFilter().get_ordering(request, queryset, view) or []
+        keys = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        if not any(name in ('pk', 'id') for name, _ in keys):
+            keys.append(('pk', keys[0][1] if keys else False))
+        return keys
+
+    @staticmethod
+    def after(keys, values):
+        """Build the lexicographic 'row comes after values' condition for the keys."""
+        condition = Q()
+        for i, (name, desc) in enumerate(keys):
+            term = Q(**{f'{name}__lt' if desc else f'{name}__gt': values[i]})
+            for j in range(i):
+                term &= Q(**{keys[j][0]: values[j]})
+            condition |= term
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            values, reverse = cursor['v'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def encode_cursor(self, row, reverse):
+        # Rows are model instances, or dicts when the view lists .values() rows
+        values = [row[name] if isinstance(row, dict) else getattr(row, name) for name, _ in self.keys]
+        cursor = json.dumps({'v': values, 'r': int(reverse)}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        encoded = urlsafe_b64encode(cursor.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
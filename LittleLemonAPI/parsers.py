@@ -0,0 +1,56 @@
+import codecs
+import csv
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def decoded_lines(stream, encoding):
+    """Read ``stream`` line by line as text, without holding the whole body."""
+    return codecs.iterdecode(stream, encoding)
+
+
+class NDJSONParser(BaseParser):
+    """
+    Newline-delimited JSON, one object per line. ``request.data`` is a lazy
+    iterator, so bodies of any size are read as they are consumed.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        return self.rows(stream, encoding) if stream is not None else iter(())
+
+    @staticmethod
+    def rows(stream, encoding):
+        for number, line in enumerate(decoded_lines(stream, encoding), 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                raise ParseError(f'Line {number}: {exc}')
+            if not isinstance(row, dict):
+                raise ParseError(f'Line {number}: expected an object.')
+            yield row
+
+
+class CSVParser(BaseParser):
+    """
+    CSV with a header row. Like NDJSONParser, ``request.data`` is a lazy
+    iterator of rows; empty cells are left out of each row.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        return self.rows(stream, encoding) if stream is not None else iter(())
+
+    @staticmethod
+    def rows(stream, encoding):
+        try:
+            for row in csv.DictReader(decoded_lines(stream, encoding)):
+                yield {name: value for name, value in row.items() if name and value not in ('', None)}
+        except csv.Error as exc:
+            raise ParseError(f'Invalid CSV: {exc}')
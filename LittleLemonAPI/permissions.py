@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+MANAGER = 'Manager'
+DELIVERY_CREW = 'Delivery crew'
+
+GENERATION_KEY = 'roles:generation'
+
+
+def role_cache():
+    """Return the cache that holds users' roles; it has to be shared between workers."""
+    return caches[getattr(settings, 'ROLE_CACHE_ALIAS', 'default')]
+
+
+def _user_key(user_pk):
+    return f'roles:user:{user_pk}'
+
+
+def user_roles(user):
+    """
+    Return the names of the groups ``user`` belongs to.
+
+    The result is cached across requests, for at most ROLE_CACHE_TIMEOUT
+    seconds, together with the role generation it was computed for; bumping
+    the generation invalidates every entry.
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+    key = _user_key(user.pk)
+    cache = role_cache()
+    cached = cache.get_many([key, GENERATION_KEY])
+    generation = cached.get(GENERATION_KEY, 0)
+    entry = cached.get(key)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+
+    roles = frozenset(user.groups.values_list('name', flat=True))
+    cache.set(key, (generation, roles), getattr(settings, 'ROLE_CACHE_TIMEOUT', 30))
+    return roles
+
+
+def request_roles(request):
+    """Return the roles of the requesting user, resolved at most once per request."""
+    roles = getattr(request, '_role_names', None)
+    if roles is None:
+        roles = user_roles(request.user)
+        request._role_names = roles
+    return roles
+
+
+def invalidate_user_roles(*user_pks):
+    role_cache().delete_many([_user_key(pk) for pk in user_pks])
+
+
+def invalidate_all_roles():
+    try:
+        role_cache().incr(GENERATION_KEY)
+    except ValueError:
+        role_cache().set(GENERATION_KEY, 1, None)
+
+
+class HasRole(BasePermission):
+    role = None
+    message = 'Forbidden'
+
+    def has_permission(self, request, view):
+        return self.role in request_roles(request)
+
+
+class IsManager(HasRole):
+    role = MANAGER
+
+
+class IsDeliveryCrew(HasRole):
+    role = DELIVERY_CREW
+
+
+class IsManagerOrReadOnly(IsManager):
+    def has_permission(self, request, view):
+        return request.method in SAFE_METHODS or super().has_permission(request, view)
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router
+from django.utils import timezone
+
+from .models import Cart, MenuItem
+
+
+def refresh_cart_prices(menuitem_ids=None, user=None, using=None):
+    """
+    Re-price the cart rows of ``menuitem_ids`` (all menu items by default),
+    optionally only in ``user``'s cart, from their menu item's current
+    price, and return how many rows changed.
+
+    Each batch of CART_PRICE_REFRESH_BATCH_SIZE menu items is one
+    UPDATE ... FROM the menu item table that only touches rows whose unit
+    price differs, so carts are never loaded into Python. Rows priced less
+    than CART_PRICE_LOCK seconds ago keep the price the customer was shown;
+    checkout re-prices them once the lock has expired.
+    """
+    using = using or router.db_for_write(Cart)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    cart = qn(Cart._meta.db_table)
+    menu = qn(MenuItem._meta.db_table)
+    user_col, menuitem_col, quantity_col, unit_price_col, price_col, priced_at_col = (
+        qn(Cart._meta.get_field(name).column)
+        for name in ['user', 'menuitem', 'quantity', 'unit_price', 'price', 'priced_at']
+    )
+    menu_pk = f'{menu}.{qn(MenuItem._meta.pk.column)}'
+    menu_price = f'{menu}.{qn(MenuItem._meta.get_field("price").column)}'
+    now = timezone.now()
+    adapt = connection.ops.adapt_datetimefield_value
+
+    sql = (
+        f'UPDATE {cart} SET {unit_price_col} = {menu_price}, '
+        f'{price_col} = ROUND({menu_price} * {cart}.{quantity_col}, 2), {priced_at_col} = %s '
+        f'FROM {menu} WHERE {menu_pk} = {cart}.{menuitem_col} AND {cart}.{unit_price_col} <> {menu_price}'
+    )
+    params = [adapt(now)]
+    lock = getattr(settings, 'CART_PRICE_LOCK', 0)
+    if lock:
+        sql += f' AND {cart}.{priced_at_col} <= %s'
+        params.append(adapt(now - timedelta(seconds=lock)))
+    if user is not None:
+        sql += f' AND {cart}.{user_col} = %s'
+        params.append(user.pk)
+
+    if menuitem_ids is None:
+        batches = [None]
+    else:
+        menuitem_ids = sorted(set(menuitem_ids))
+        size = getattr(settings, 'CART_PRICE_REFRESH_BATCH_SIZE', 500)
+        batches = [menuitem_ids[start:start + size] for start in range(0, len(menuitem_ids), size)]
+
+    updated = 0
+    with connection.cursor() as cursor:
+        for batch in batches:
+            if batch is None:
+                cursor.execute(sql, params)
+            else:
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(f'{sql} AND {cart}.{menuitem_col} IN ({placeholders})', [*params, *batch])
+            updated += cursor.rowcount
+    return updated
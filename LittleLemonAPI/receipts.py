@@ -0,0 +1,19 @@
+from django.core.mail import send_mail
+
+from .models import Order
+
+
+def receipt_text(order):
+    lines = [f'Order {order.pk} placed on {order.date}', '']
+    lines += [f'{item.quantity} x {item.menuitem.title}: {item.price}' for item in order.order_items.all()]
+    lines += ['', f'Total: {order.total}']
+    return '\n'.join(lines)
+
+
+def send_order_receipt(order):
+    """Email the customer a receipt for order ``order`` (an id). Run from the task outbox after checkout."""
+    order = Order.objects.select_related('user').with_items().filter(pk=order).first()
+    # Deleted since, or nowhere to send it
+    if order is None or not order.user.email:
+        return
+    send_mail(f'Your Little Lemon order {order.pk}', receipt_text(order), None, [order.user.email])
@@ -0,0 +1,112 @@
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoded with orjson when it is installed. The bytes are the
+    same as JSONRenderer's for compact, unicode output: types orjson does not
+    know (and datetimes, which it formats differently) go through DRF's
+    encoder. Indented output and anything orjson rejects are left to
+    JSONRenderer.
+    """
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+               if orjson else 0)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escape U+2028 and U+2029 like JSONRenderer does
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class StreamingRendererMixin:
+    """
+    Renderers for row formats that can also encode rows one at a time, for
+    StreamingHttpResponse. Output is sent in chunks of about ``chunk_size``
+    bytes rather than one per row.
+    """
+    chunk_size = 8192
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = [data]
+        data = list(data or [])
+        return b''.join(self.stream(data, list(data[0]) if data else []))
+
+    def stream(self, rows, fields):
+        chunk = [self.start(fields)]
+        size = len(chunk[0])
+        for row in rows:
+            encoded = self.encode(row, fields)
+            chunk.append(encoded)
+            size += len(encoded)
+            if size >= self.chunk_size:
+                yield b''.join(chunk)
+                chunk, size = [], 0
+        yield b''.join(chunk)
+
+    async def astream(self, rows, fields):
+        chunk = [self.start(fields)]
+        size = len(chunk[0])
+        async for row in rows:
+            encoded = self.encode(row, fields)
+            chunk.append(encoded)
+            size += len(encoded)
+            if size >= self.chunk_size:
+                yield b''.join(chunk)
+                chunk, size = [], 0
+        yield b''.join(chunk)
+
+    def start(self, fields):
+        return b''
+
+    def encode(self, row, fields):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamingRendererMixin, BaseRenderer):
+    """Newline-delimited JSON, one object per line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def __init__(self):
+        self.json = ORJSONRenderer()
+
+    def encode(self, row, fields):
+        return self.json.render(row) + b'\n'
+
+
+class CSVRenderer(StreamingRendererMixin, BaseRenderer):
+    """CSV with a header row, columns in ``fields`` order."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def start(self, fields):
+        return self.line(fields)
+
+    def encode(self, row, fields):
+        return self.line([row.get(name) for name in fields])
+
+    @staticmethod
+    def line(values):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        return buffer.getvalue().encode()
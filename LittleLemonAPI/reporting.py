@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import F, Max, Min, Sum
+
+from .models import DailyMenuItemSales, DailySales, Order, OrderItem
+
+
+def columns(connection, model, *names):
+    qn = connection.ops.quote_name
+    return [qn(model._meta.get_field(name).column) for name in names]
+
+
+def record_sale(order, using=None):
+    """
+    Add a newly placed order to the sales rollups with one upsert into the
+    day's totals and one into its menu items, copied from the order items
+    the order was just given. Runs inside the checkout transaction, so the
+    rollups never count an order that was rolled back.
+    """
+    using = using or router.db_for_write(DailySales)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    ops = connection.ops
+    date = ops.adapt_datefield_value(order.date)
+
+    sales = qn(DailySales._meta.db_table)
+    day, orders, items, revenue = columns(connection, DailySales, 'date', 'orders', 'items', 'revenue')
+    day_sql = (
+        f'INSERT INTO {sales} ({day}, {orders}, {items}, {revenue}) VALUES (%s, 1, %s, %s) '
+        f'ON CONFLICT ({day}) DO UPDATE SET {orders} = {sales}.{orders} + 1, '
+        f'{items} = {sales}.{items} + excluded.{items}, '
+        f'{revenue} = ROUND({sales}.{revenue} + excluded.{revenue}, 2)'
+    )
+
+    item_sales = qn(DailyMenuItemSales._meta.db_table)
+    day, menuitem, orders, quantity, revenue = columns(
+        connection, DailyMenuItemSales, 'date', 'menuitem', 'orders', 'quantity', 'revenue')
+    item_order, item_menuitem, item_quantity, item_price = columns(connection, OrderItem, 'order', 'menuitem', 'quantity', 'price')
+    items_sql = (
+        f'INSERT INTO {item_sales} ({day}, {menuitem}, {orders}, {quantity}, {revenue}) '
+        f'SELECT %s, {item_menuitem}, 1, {item_quantity}, {item_price} '
+        f'FROM {qn(OrderItem._meta.db_table)} WHERE {item_order} = %s '
+        f'ON CONFLICT ({day}, {menuitem}) DO UPDATE SET {orders} = {item_sales}.{orders} + 1, '
+        f'{quantity} = {item_sales}.{quantity} + excluded.{quantity}, '
+        f'{revenue} = ROUND({item_sales}.{revenue} + excluded.{revenue}, 2)'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(day_sql, [date, order.items_count, ops.adapt_decimalfield_value(order.total, 12, 2)])
+        cursor.execute(items_sql, [date, order.pk])
+
+
+def rebuild(start, end, using=None):
+    """
+    Recompute the rollups for the days from ``start`` to ``end`` (inclusive)
+    from the orders: the days' rows are deleted and re-aggregated with one
+    INSERT ... SELECT per table.
+    """
+    using = using or router.db_for_write(DailySales)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    bounds = [connection.ops.adapt_datefield_value(start), connection.ops.adapt_datefield_value(end)]
+    order_table = qn(Order._meta.db_table)
+    order_pk, order_date, order_total, order_items = columns(connection, Order, 'id', 'date', 'total', 'items_count')
+    item_order, item_menuitem, item_quantity, item_price = columns(connection, OrderItem, 'order', 'menuitem', 'quantity', 'price')
+
+    day_sql = (
+        f'INSERT INTO {qn(DailySales._meta.db_table)} '
+        f'({", ".join(columns(connection, DailySales, "date", "orders", "items", "revenue"))}) '
+        f'SELECT {order_date}, COUNT(*), SUM({order_items}), ROUND(SUM({order_total}), 2) '
+        f'FROM {order_table} WHERE {order_date} BETWEEN %s AND %s GROUP BY {order_date}'
+    )
+    items_sql = (
+        f'INSERT INTO {qn(DailyMenuItemSales._meta.db_table)} '
+        f'({", ".join(columns(connection, DailyMenuItemSales, "date", "menuitem", "orders", "quantity", "revenue"))}) '
+        f'SELECT o.{order_date}, i.{item_menuitem}, COUNT(*), SUM(i.{item_quantity}), ROUND(SUM(i.{item_price}), 2) '
+        f'FROM {qn(OrderItem._meta.db_table)} i JOIN {order_table} o ON o.{order_pk} = i.{item_order} '
+        f'WHERE o.{order_date} BETWEEN %s AND %s GROUP BY o.{order_date}, i.{item_menuitem}'
+    )
+    with transaction.atomic(using=using):
+        DailySales.objects.using(using).filter(date__range=(start, end)).delete()
+        DailyMenuItemSales.objects.using(using).filter(date__range=(start, end)).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(day_sql, bounds)
+            cursor.execute(items_sql, bounds)
+
+
+def rebuild_in_chunks(start=None, end=None, days=31, using=None):
+    """
+    Rebuild the rollups ``days`` days at a time, each chunk in its own
+    transaction, and yield every chunk's (start, end) once it is committed.
+    Without ``start`` or ``end`` the range of order dates is used; rollups
+    of days outside it are dropped.
+    """
+    using = using or router.db_for_write(DailySales)
+    if start is None or end is None:
+        first, last = Order.objects.using(using).aggregate(first=Min('date'), last=Max('date')).values()
+        if first is None:
+            DailySales.objects.using(using).all().delete()
+            DailyMenuItemSales.objects.using(using).all().delete()
+            return
+        DailySales.objects.using(using).exclude(date__range=(first, last)).delete()
+        DailyMenuItemSales.objects.using(using).exclude(date__range=(first, last)).delete()
+        start, end = start or first, end or last
+    while start <= end:
+        chunk_end = min(start + timedelta(days=days - 1), end)
+        rebuild(start, chunk_end, using)
+        yield start, chunk_end
+        start = chunk_end + timedelta(days=1)
+
+
+def refresh_days(dates, using=None):
+    """Rebuild the rollups of the given days after their orders were edited outside checkout."""
+    for date in sorted({date for date in dates if date is not None}):
+        rebuild(date, date, using)
+
+
+def daily_sales(start, end):
+    days = DailySales.objects.filter(date__range=(start, end)).order_by('date')
+    return days, days.aggregate(orders=Sum('orders'), items=Sum('items'), revenue=Sum('revenue'))
+
+
+def menu_item_sales(start, end, ordering, limit):
+    return (
+        DailyMenuItemSales.objects.filter(date__range=(start, end))
+        .values('menuitem').annotate(
+            title=F('menuitem__title'), orders=Sum('orders'), quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by(f'-{ordering}', 'menuitem')[:limit]
+    )
+
+
+def category_sales(start, end):
+    return (
+        DailyMenuItemSales.objects.filter(date__range=(start, end))
+        .values(category=F('menuitem__category')).annotate(
+            title=F('menuitem__category__title'), quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'category')
+    )
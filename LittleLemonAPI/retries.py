@@ -0,0 +1,42 @@
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+LOCK_ERRORS = ('database is locked', 'database table is locked')
+
+
+def is_lock_error(exc):
+    """Whether ``exc`` is SQLite refusing a statement because another connection holds a lock."""
+    return isinstance(exc, OperationalError) and any(message in str(exc) for message in LOCK_ERRORS)
+
+
+def retry_on_lock(func):
+    """
+    Run ``func`` again when SQLite reports lock contention, up to
+    DATABASE_LOCK_RETRIES more times with jittered exponential backoff from
+    DATABASE_LOCK_RETRY_DELAY seconds.
+
+    With the WAL profile writers already queue on busy_timeout; this covers
+    the lock errors SQLite returns without waiting, such as those of
+    shared-cache (in-memory) databases or a lock held beyond the timeout
+    during a burst. ``func`` must run its own transaction: calls made inside
+    an atomic block are not retried, since the enclosing transaction cannot
+    be replayed.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = getattr(settings, 'DATABASE_LOCK_RETRIES', 5)
+        delay = getattr(settings, 'DATABASE_LOCK_RETRY_DELAY', 0.05)
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if attempt >= retries or not is_lock_error(exc) or transaction.get_connection().in_atomic_block:
+                    raise
+            time.sleep(delay * 2 ** attempt * random.uniform(0.5, 1.5))
+            attempt += 1
+    return wrapper
@@ -0,0 +1,145 @@
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def sticky_cache():
+    return caches[getattr(settings, 'DATABASE_STICKY_CACHE_ALIAS', 'default')]
+
+
+def client_key(request):
+    """
+    Identify the client behind ``request`` by its credentials without a
+    query: a digest of the Authorization header or session cookie, or None
+    for anonymous requests.
+    """
+    credentials = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return 'db:sticky:' + hashlib.sha256(credentials.encode()).hexdigest()
+
+
+def reads_from_replica(request):
+    """
+    Whether ``request`` may read from a replica: it is a read, replicas are
+    configured and the client has not written in the last
+    DATABASE_STICKY_SECONDS, so it always sees its own writes.
+    """
+    if request.method not in SAFE_METHODS or not replicas():
+        return False
+    key = client_key(request)
+    return key is None or not sticky_cache().get(key)
+
+
+async def areads_from_replica(request):
+    if request.method not in SAFE_METHODS or not replicas():
+        return False
+    key = client_key(request)
+    return key is None or not await sticky_cache().aget(key)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Let the router send reads made inside the block to a replica."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads_active():
+    """Whether reads made here may be served by a replica."""
+    return _replica_reads.get() and bool(replicas())
+
+
+class PrimaryReplicaRouter:
+    """
+    Write to the primary and read from it, except inside replica_reads()
+    blocks, where reads of this app's models go to a random replica.
+
+    Views opt in with ReplicaReadsMixin; everything else, including
+    authentication, permissions and reads inside a transaction on the
+    primary, stays on the primary.
+    """
+    replicated_apps = {'LittleLemonAPI'}
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or model._meta.app_label not in self.replicated_apps:
+            return None
+        aliases = replicas()
+        if not aliases or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        # Never fall back to the database an instance was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in replicas()
+
+
+class ReplicaReadsMixin:
+    """Serve safe requests to a DRF view from a replica, subject to reads_from_replica()."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(reads_from_replica(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+
+class StickyPrimaryMiddleware:
+    """
+    After a client sends a write, read its requests from the primary for
+    DATABASE_STICKY_SECONDS, so it is not served data from a replica that
+    has not caught up with its own changes yet. Clients are told apart by
+    their credentials (see client_key()); the marker lives in the
+    DATABASE_STICKY_CACHE_ALIAS cache, which has to be shared by all workers.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        key = self.written(request)
+        if key is not None:
+            sticky_cache().set(key, True, getattr(settings, 'DATABASE_STICKY_SECONDS', 10))
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        key = self.written(request)
+        if key is not None:
+            await sticky_cache().aset(key, True, getattr(settings, 'DATABASE_STICKY_SECONDS', 10))
+        return response
+
+    @staticmethod
+    def written(request):
+        """The sticky key of a client that may just have written, if replicas are in use."""
+        if request.method in SAFE_METHODS or not replicas():
+            return None
+        return client_key(request)
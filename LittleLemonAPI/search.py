@@ -0,0 +1,218 @@
+from difflib import SequenceMatcher
+
+from django.db import connections, router
+from django.db.models import Case, IntegerField, When
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from .models import MenuItem
+
+SEARCH_TABLE = 'LittleLemonAPI_menuitem_search'
+
+
+class MenuSearchIndex:
+    """
+    Full-text index over menu item titles, stored in a side table that the
+    MenuItem signals keep in sync.
+
+    ``filter()`` narrows a menu item queryset to the matches, ordered by
+    relevance. Terms are matched as substrings (SQLite) or word prefixes
+    (PostgreSQL) with a subquery on the index table, so every match is
+    returned. When nothing matches, a trigram query collects up to
+    ``fuzzy_candidates`` candidates and those within one or two typos of the
+    search terms are returned instead.
+    """
+    fuzzy_candidates = 200
+    fuzzy_threshold = 0.75
+    id_column = None
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.table = connection.ops.quote_name(SEARCH_TABLE)
+
+    def filter(self, queryset, terms, ranked=True):
+        terms = [term.lower() for term in terms if term]
+        match = self.match(terms)
+        if match and self.execute(f'SELECT 1 FROM {self.table} WHERE {match[0]} LIMIT 1', match[1]):
+            where, params = match
+            queryset = queryset.filter(
+                pk__in=RawSQL(f'SELECT {self.id_column} FROM {self.table} WHERE {where}', params))
+            if ranked:
+                qn = self.connection.ops.quote_name
+                menuitem = f'{qn(MenuItem._meta.db_table)}.{qn(MenuItem._meta.pk.column)}'
+                rank, rank_params = self.rank(terms)
+                rank = RawSQL(
+                    f'(SELECT {rank} FROM {self.table} WHERE {where} AND {self.table}.{self.id_column} = {menuitem})',
+                    rank_params + params,
+                )
+                queryset = queryset.order_by(rank.asc(), 'pk')
+            return queryset
+
+        ids = self.fuzzy_match(terms)
+        queryset = queryset.filter(pk__in=ids)
+        if ids and ranked:
+            rank = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(ids)], output_field=IntegerField())
+            queryset = queryset.order_by(rank, 'pk')
+        return queryset
+
+    def fuzzy_match(self, terms):
+        candidates = self.fuzzy_candidates_for(terms)
+        scored = []
+        for pk, title in candidates:
+            words = title.lower().split()
+            score = min(max(self.similarity(term, word) for word in words) for term in terms) if words else 0
+            if score >= self.fuzzy_threshold:
+                scored.append((-score, pk))
+        return [pk for _, pk in sorted(scored)]
+
+    @staticmethod
+    def similarity(term, word):
+        return max(
+            SequenceMatcher(None, term, word).ratio(),
+            SequenceMatcher(None, term, word[:len(term)]).ratio(),
+        )
+
+    def execute(self, sql, params):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def index(self, menuitems):
+        raise NotImplementedError
+
+    def remove(self, pks):
+        raise NotImplementedError
+
+    def match(self, terms):
+        """Return the WHERE clause and params selecting matching index rows, or None."""
+        raise NotImplementedError
+
+    def rank(self, terms):
+        """Return an expression over a matching index row that sorts the best match first."""
+        raise NotImplementedError
+
+    def fuzzy_candidates_for(self, terms):
+        raise NotImplementedError
+
+
+class SQLiteMenuSearchIndex(MenuSearchIndex):
+    """FTS5 table with the trigram tokenizer; the rowid is the menu item id."""
+    id_column = 'rowid'
+
+    @staticmethod
+    def quote(text):
+        return '"' + text.replace('"', '""') + '"'
+
+    def index(self, menuitems):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'REPLACE INTO {self.table} (rowid, title) VALUES (%s, %s)',
+                [(item.pk, item.title) for item in menuitems],
+            )
+
+    def remove(self, pks):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in pks])
+
+    def match(self, terms):
+        # The trigram tokenizer cannot match fewer than three characters,
+        # so short terms fall back to LIKE on the (small) index table.
+        long_terms = [term for term in terms if len(term) >= 3]
+        short_terms = [term for term in terms if len(term) < 3]
+        where, params = [], []
+        if long_terms:
+            where.append(f'{self.table} MATCH %s')
+            params.append(' AND '.join(self.quote(term) for term in long_terms))
+        for term in short_terms:
+            where.append(f'{self.table}.title LIKE %s')
+            params.append(f'%{term}%')
+        return (' AND '.join(where), params) if where else None
+
+    def rank(self, terms):
+        if any(len(term) >= 3 for term in terms):
+            return f'bm25({self.table})', []
+        return '0', []
+
+    def fuzzy_candidates_for(self, terms):
+        trigrams = {term[i:i + 3] for term in terms for i in range(len(term) - 2)}
+        if not trigrams:
+            return []
+        return self.execute(
+            f'SELECT rowid, title FROM {self.table} WHERE {self.table} MATCH %s '
+            f'ORDER BY bm25({self.table}) LIMIT %s',
+            [' OR '.join(self.quote(trigram) for trigram in sorted(trigrams)), self.fuzzy_candidates],
+        )
+
+
+class PostgresMenuSearchIndex(MenuSearchIndex):
+    """tsvector column with a GIN index, plus a pg_trgm index for typo tolerance."""
+    id_column = 'menuitem_id'
+
+    @staticmethod
+    def prefix_query(terms):
+        words = [''.join(ch for ch in term if ch.isalnum()) for term in terms]
+        return ' & '.join(f'{word}:*' for word in words if word)
+
+    def index(self, menuitems):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (menuitem_id, title, document) '
+                f"VALUES (%s, %s, to_tsvector('simple', %s)) "
+                f'ON CONFLICT (menuitem_id) DO UPDATE SET title = excluded.title, document = excluded.document',
+                [(item.pk, item.title, item.title) for item in menuitems],
+            )
+
+    def remove(self, pks):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE menuitem_id = ANY(%s)', [list(pks)])
+
+    def match(self, terms):
+        query = self.prefix_query(terms)
+        if not query:
+            return None
+        return "document @@ to_tsquery('simple', %s)", [query]
+
+    def rank(self, terms):
+        return "-ts_rank(document, to_tsquery('simple', %s))", [self.prefix_query(terms)]
+
+    def fuzzy_candidates_for(self, terms):
+        text = ' '.join(terms)
+        return self.execute(
+            f'SELECT menuitem_id, title FROM {self.table} WHERE %s <%% title '
+            f'ORDER BY word_similarity(%s, title) DESC LIMIT %s',
+            [text, text, self.fuzzy_candidates],
+        )
+
+
+INDEX_CLASSES = {
+    'sqlite': SQLiteMenuSearchIndex,
+    'postgresql': PostgresMenuSearchIndex,
+}
+
+
+def menu_search_index(using=None):
+    """Return the search index for the given database, or None if unsupported."""
+    connection = connections[using or router.db_for_write(MenuItem)]
+    index_class = INDEX_CLASSES.get(connection.vendor)
+    return index_class(connection) if index_class else None
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Drop-in replacement for SearchFilter on MenuItemView that answers
+    ``?search=`` from the menu search index. Results are ranked by relevance
+    unless the client asks for an explicit ordering. Databases without a
+    search index fall back to SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        index = menu_search_index(queryset.db)
+        if not terms or index is None:
+            return super().filter_queryset(request, queryset, view)
+
+        return index.filter(queryset, terms, ranked=not request.query_params.get('ordering'))
@@ -1,13 +1,85 @@
+from datetime import date, timedelta
+
+from django.conf import settings
 from rest_framework import serializers
-from .models import MenuItem, Category, Order, OrderItem, Cart
+from rest_framework.permissions import SAFE_METHODS
+from .models import AssignmentPolicy, DailySales, MenuItem, Category, Order, OrderChange, OrderItem, Cart
 from django.contrib.auth.models import User
+from .instrumentation import TimedSerializerMixin
+
+
+def sparse_fieldset(request):
+    """
+    Parse ``?fields=`` and ``?expand=`` from a read request.
+
+    Returns None when neither is given, otherwise a pair of the requested
+    top-level fields (None for all) and the set of expanded relation paths,
+    with the parents of dotted paths included.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    if 'fields' not in params and 'expand' not in params:
+        return None
+    only = {name for name in params['fields'].split(',') if name} if 'fields' in params else None
+    expand = set()
+    for path in params.get('expand', '').split(','):
+        parts = [part for part in path.split('.') if part]
+        expand.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+    return only, expand
+
+
+def expands(request, path):
+    """Whether a response to ``request`` renders the nested relation at ``path`` in full."""
+    fieldset = sparse_fieldset(request)
+    return fieldset is None or path in fieldset[1]
+
+
+class SparseFieldsetMixin:
+    """
+    Sparse fieldsets for read requests. Without ``fields`` or ``expand`` the
+    full representation is returned. Otherwise ``fields`` picks the top-level
+    fields, and nested relations are only rendered in full when named in
+    ``expand`` (dotted for deeper levels, e.g. ``order_items.menuitem``);
+    other nested objects become their primary key and nested lists are left
+    out.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = sparse_fieldset(self.context.get('request'))
+        if fieldset is None:
+            return fields
+        only, expand = fieldset
+        path = self.field_path()
+        if only is not None and not path:
+            fields = {name: field for name, field in fields.items() if name in only or field.write_only}
+        for name, field in list(fields.items()):
+            if field.write_only or not isinstance(field, serializers.BaseSerializer):
+                continue
+            if (f'{path}.{name}' if path else name) in expand:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                del fields[name]
+            else:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, source=field.source)
+        return fields
+
+    def field_path(self):
+        names, node = [], self
+        while node is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'slug', 'title']
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), source='category', write_only=True)
 
@@ -15,7 +87,28 @@ class MenuItemSerializer(serializers.ModelSerializer):
         model = MenuItem
         fields = ['id', 'title', 'price', 'featured', 'category', 'category_id']
 
-class CartSerializer(serializers.ModelSerializer):
+class CategoryBulkSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(min_value=1, required=False)
+    # Uniqueness is checked for the whole batch at once
+    slug = serializers.SlugField(max_length=50)
+
+    class Meta:
+        model = Category
+        fields = ['id', 'slug', 'title']
+
+class MenuItemBulkSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(min_value=1, required=False)
+    # Checked for the whole batch with one query instead of one per row
+    category_id = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = MenuItem
+        fields = ['id', 'title', 'price', 'featured', 'category_id']
+
+class BulkDeleteSerializer(TimedSerializerMixin, serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+class CartSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     user_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), source='user', write_only=True)
     menuitem = MenuItemSerializer(read_only=True)
@@ -39,7 +132,11 @@ class CartSerializer(serializers.ModelSerializer):
 
         return attrs
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class CartBulkItemSerializer(TimedSerializerMixin, serializers.Serializer):
+    menuitem_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0, max_value=32767)
+
+class OrderItemSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
     order = serializers.PrimaryKeyRelatedField(read_only=True)
     order_id = serializers.PrimaryKeyRelatedField(queryset=Order.objects.all(), source='order', write_only=True)
     menuitem = MenuItemSerializer(read_only=True)
@@ -61,7 +158,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         
         return attrs
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     user_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), source='user', write_only=True)
     delivery_crew = serializers.PrimaryKeyRelatedField(read_only=True)
@@ -71,4 +168,59 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ['id', 'user', 'user_id', 'delivery_crew', 'delivery_crew_id', 'status', 'date', 'total', 'order_items']
+        fields = ['id', 'user', 'user_id', 'delivery_crew', 'delivery_crew_id', 'status', 'date', 'total', 'items_count', 'order_items']
+        read_only_fields = ['items_count']
+
+class OrderChangeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    seq = serializers.IntegerField(source='id', read_only=True)
+
+    class Meta:
+        model = OrderChange
+        fields = ['seq', 'order', 'placed', 'status', 'delivery_crew', 'previous_delivery_crew']
+        read_only_fields = fields
+
+
+class SalesReportQuerySerializer(TimedSerializerMixin, serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    ordering = serializers.ChoiceField(choices=['revenue', 'quantity', 'orders'], default='revenue')
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        attrs.setdefault('end', date.today())
+        attrs.setdefault('start', attrs['end'] - timedelta(days=getattr(settings, 'REPORTS_DEFAULT_DAYS', 30) - 1))
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'start': 'start must not be after end.'})
+        return attrs
+
+
+class DailySalesSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = DailySales
+        fields = ['date', 'orders', 'items', 'revenue']
+
+
+class SalesTotalSerializer(TimedSerializerMixin, serializers.Serializer):
+    orders = serializers.IntegerField()
+    items = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class MenuItemSalesSerializer(TimedSerializerMixin, serializers.Serializer):
+    menuitem = serializers.IntegerField()
+    title = serializers.CharField()
+    orders = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class CategorySalesSerializer(TimedSerializerMixin, serializers.Serializer):
+    category = serializers.IntegerField()
+    title = serializers.CharField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class OrderAssignmentSerializer(TimedSerializerMixin, serializers.Serializer):
+    policy = serializers.ChoiceField(choices=AssignmentPolicy.choices, default=AssignmentPolicy.LEAST_LOADED)
+    limit = serializers.IntegerField(min_value=1, required=False)
@@ -0,0 +1,235 @@
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Prefetch, Sum, prefetch_related_objects
+from django.utils import timezone
+
+from .cache import bump_list_version
+from .models import Cart, Category, MenuItem, Order, OrderItem
+from .pricing import refresh_cart_prices
+from .reporting import record_sale
+from .retries import retry_on_lock
+from .tasks import enqueue
+
+
+# Cart.quantity is a SmallIntegerField
+MAX_CART_QUANTITY = 32767
+
+# Columns add_to_cart reads back from the statement that writes the row
+CART_FIELDS = ['id', 'quantity', 'unit_price', 'price', 'priced_at']
+MENU_FIELDS = ['title', 'price', 'featured', 'category']
+CATEGORY_FIELDS = ['slug', 'title']
+
+
+class EmptyCartError(Exception):
+    """Raised when a user checks out without any items in their cart."""
+
+
+class UnknownMenuItemsError(Exception):
+    """Raised when a cart update refers to menu items that do not exist."""
+
+    def __init__(self, menuitem_ids):
+        super().__init__(f'Menu items not found: {sorted(menuitem_ids)}')
+        self.menuitem_ids = menuitem_ids
+
+
+@retry_on_lock
+def add_to_cart(user, menuitem_id, quantity=1):
+    """
+    Add ``quantity`` of a menu item to the user's cart, or increase the
+    quantity of the existing row up to MAX_CART_QUANTITY.
+
+    The unit price is read from the menu item, and the menu item and its
+    category are returned, by the statement that writes the row. On
+    PostgreSQL that is a single INSERT ... ON CONFLICT, which reports a
+    fresh insert through xmax. Elsewhere an INSERT ... ON CONFLICT DO
+    NOTHING is followed by an UPDATE, in the same transaction, when the row
+    already exists. Returns a ``(cart_item, created)`` tuple, or
+    ``(None, False)`` when the menu item does not exist.
+    """
+    using = router.db_for_write(Cart)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    cart = qn(Cart._meta.db_table)
+    menu = qn(MenuItem._meta.db_table)
+    category = qn(Category._meta.db_table)
+    user_col, menuitem_col, quantity_col, unit_price_col, price_col, priced_at_col = (
+        qn(Cart._meta.get_field(name).column)
+        for name in ['user', 'menuitem', 'quantity', 'unit_price', 'price', 'priced_at']
+    )
+    menu_pk = qn(MenuItem._meta.pk.column)
+    menu_price = qn(MenuItem._meta.get_field('price').column)
+    menu_category = qn(MenuItem._meta.get_field('category').column)
+
+    def capped(added):
+        total = f'{cart}.{quantity_col} + {added}'
+        return f'CASE WHEN {total} > {MAX_CART_QUANTITY} THEN {MAX_CART_QUANTITY} ELSE {total} END'
+
+    def increment(added):
+        return (f'{quantity_col} = {capped(added)}, '
+                f'{price_col} = ROUND({cart}.{unit_price_col} * {capped(added)}, 2)')
+
+    # The menu item and category are read back with subqueries, so the view
+    # does not have to load them again
+    menu_row = f'{menu}.{menu_pk} = {cart}.{menuitem_col}'
+    menu_fields = [
+        f'(SELECT {menu}.{qn(MenuItem._meta.get_field(name).column)} FROM {menu} WHERE {menu_row})'
+        for name in MENU_FIELDS
+    ]
+    category_fields = [
+        f'(SELECT {category}.{qn(Category._meta.get_field(name).column)} FROM {category} '
+        f'JOIN {menu} ON {menu}.{menu_category} = {category}.{qn(Category._meta.pk.column)} WHERE {menu_row})'
+        for name in CATEGORY_FIELDS
+    ]
+    returning = ', '.join([
+        *menu_fields, *category_fields, *(f'{cart}.{qn(Cart._meta.get_field(name).column)}' for name in CART_FIELDS),
+    ])
+    insert = (
+        f'INSERT INTO {cart} ({user_col}, {menuitem_col}, {quantity_col}, {unit_price_col}, {price_col}, {priced_at_col}) '
+        f'SELECT %s, {menu_pk}, %s, {menu_price}, ROUND({menu_price} * %s, 2), %s '
+        f'FROM {menu} WHERE {menu_pk} = %s '
+        f'ON CONFLICT ({menuitem_col}, {user_col}) '
+    )
+    insert_params = [user.pk, quantity, quantity, connection.ops.adapt_datetimefield_value(timezone.now()), menuitem_id]
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # xmax is 0 only on a row version written by an INSERT
+            cursor.execute(
+                f'{insert}DO UPDATE SET {increment(f"excluded.{quantity_col}")} '
+                f'RETURNING {returning}, ({cart}.xmax = 0)', insert_params)
+            row = cursor.fetchone()
+            row, created = (row[:-1], row[-1]) if row is not None else (None, False)
+        else:
+            with transaction.atomic(using=using, savepoint=False):
+                cursor.execute(f'{insert}DO NOTHING RETURNING {returning}', insert_params)
+                row = cursor.fetchone()
+                created = row is not None
+                if row is None:
+                    cursor.execute(
+                        f'UPDATE {cart} SET {increment("%s")} WHERE {user_col} = %s AND {menuitem_col} = %s '
+                        f'RETURNING {returning}', [quantity, quantity, quantity, quantity, user.pk, menuitem_id])
+                    row = cursor.fetchone()
+    if row is None:
+        return None, False
+    bump_list_version('cart', user.pk, using=using)
+
+    values = iter(row)
+    menuitem = _from_db(using, MenuItem, {'id': menuitem_id}, MENU_FIELDS, values)
+    menuitem.category = _from_db(using, Category, {'id': menuitem.category_id}, CATEGORY_FIELDS, values)
+    cart_item = _from_db(using, Cart, {'user': user.pk, 'menuitem': menuitem_id}, CART_FIELDS, values)
+    cart_item.user, cart_item.menuitem = user, menuitem
+    return cart_item, bool(created)
+
+
+def _from_db(using, model, known, names, values):
+    """
+    Build a model instance from the raw column values for ``names``, taken
+    in order from the ``values`` iterator, and the already converted values
+    in ``known``.
+    """
+    connection = connections[using]
+    attrs = {model._meta.get_field(name).attname: value for name, value in known.items()}
+    for name in names:
+        field = model._meta.get_field(name)
+        column = field.get_col(model._meta.db_table)
+        value = next(values)
+        for converter in connection.ops.get_db_converters(column) + field.get_db_converters(connection):
+            value = converter(value, column, connection)
+        attrs[field.attname] = value
+    fields = model._meta.concrete_fields
+    return model.from_db(using, [f.attname for f in fields], [attrs[f.attname] for f in fields])
+
+
+@retry_on_lock
+def update_cart(user, quantities):
+    """
+    Set the quantity of many menu items in the user's cart at once.
+
+    ``quantities`` maps menu item ids to their new quantity; a quantity of
+    zero removes the item. Prices are resolved with one query, rows are
+    written with one upsert and one delete, and the full cart is returned.
+    """
+    using = router.db_for_write(Cart)
+    prices = dict(
+        MenuItem.objects.using(using)
+        .filter(pk__in=quantities).values_list('pk', 'price')
+    )
+    missing = set(quantities) - set(prices)
+    if missing:
+        raise UnknownMenuItemsError(missing)
+
+    rows = [
+        Cart(user=user, menuitem_id=menuitem_id, quantity=quantity,
+             unit_price=prices[menuitem_id], price=prices[menuitem_id] * quantity)
+        for menuitem_id, quantity in quantities.items() if quantity > 0
+    ]
+    removed = [menuitem_id for menuitem_id, quantity in quantities.items() if quantity == 0]
+
+    with transaction.atomic(using=using):
+        if rows:
+            Cart.objects.using(using).bulk_create(
+                rows, update_conflicts=True, unique_fields=['menuitem', 'user'],
+                update_fields=['quantity', 'unit_price', 'price', 'priced_at'],
+            )
+        if removed:
+            Cart.objects.using(using).filter(user=user, menuitem_id__in=removed).delete()
+        bump_list_version('cart', user.pk, using=using)
+
+    return Cart.objects.using(using).filter(user=user).select_related('menuitem__category')
+
+
+@retry_on_lock
+def checkout(user, **order_fields):
+    """
+    Turn the user's cart into an order in a single transaction.
+
+    The cart rows are locked first so that concurrent checkouts of the same
+    cart are serialized; the later ones find the cart empty. The total is
+    computed by the database and the rows are copied into OrderItem with a
+    single INSERT ... SELECT, so no cart row is loaded into Python. With a
+    CART_PRICE_LOCK, rows whose lock has expired are re-priced first. The
+    sales rollups are updated and the ORDER_PLACED_TASKS are added to the
+    task outbox in the same transaction; the tasks run after it commits.
+    """
+    using = router.db_for_write(Order)
+    with transaction.atomic(using=using):
+        cart = Cart.objects.using(using).filter(user=user)
+        # Touch the rows before reading them: this takes the write lock up
+        # front on SQLite and row locks on PostgreSQL, so concurrent checkouts
+        # queue behind each other instead of deadlocking on lock upgrades.
+        if not cart.update(quantity=F('quantity')):
+            raise EmptyCartError('No items in the cart to place an order.')
+        if getattr(settings, 'CART_PRICE_LOCK', 0):
+            # Rows whose price lock ran out since the menu price changed pay the current price
+            refresh_cart_prices(user=user, using=using)
+
+        totals = cart.aggregate(total=Sum('price'), items_count=Sum('quantity'))
+        order_fields['user'] = user
+        order = Order.objects.using(using).create(**totals, **order_fields)
+        _copy_cart_rows(using, order, user)
+        cart.delete()
+        bump_list_version('cart', user.pk, using=using)
+        record_sale(order, using)
+        enqueue([(name, {'order': order.pk}) for name in getattr(settings, 'ORDER_PLACED_TASKS', [])], using)
+
+    prefetch_related_objects([order], Prefetch(
+        'order_items',
+        queryset=OrderItem.objects.using(using).select_related('menuitem__category'),
+    ))
+    return order
+
+
+def _copy_cart_rows(using, order, user):
+    """Copy the user's (already locked) cart rows into the order's items."""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    columns = ['menuitem', 'quantity', 'unit_price', 'price']
+    cart_columns = ', '.join(qn(Cart._meta.get_field(name).column) for name in columns)
+    item_columns = ', '.join(qn(OrderItem._meta.get_field(name).column) for name in ['order'] + columns)
+    user_column = qn(Cart._meta.get_field('user').column)
+    sql = (
+        f'INSERT INTO {qn(OrderItem._meta.db_table)} ({item_columns}) '
+        f'SELECT %s, {cart_columns} FROM {qn(Cart._meta.db_table)} WHERE {user_column} = %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [order.pk, user.pk])
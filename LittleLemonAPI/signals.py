@@ -0,0 +1,171 @@
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .assignment import adjust_workloads, sync_workloads
+from .authentication import token_cache
+from .cache import bump_catalog_version, bump_list_version, in_catalog_batch
+from .feed import record_order_changes
+from .instrumentation import install_query_recorder
+from .models import Category, MenuItem, Order, OrderItem
+from .permissions import DELIVERY_CREW, invalidate_all_roles, invalidate_user_roles
+from .pricing import refresh_cart_prices
+from .reporting import refresh_days
+from .search import menu_search_index
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog(sender, using, **kwargs):
+    """
+    Any menu item or category change invalidates the cached catalog once it
+    commits; bumping earlier would let a reader cache the old rows under the
+    new version.
+    """
+    if not in_catalog_batch():
+        transaction.on_commit(bump_catalog_version, using=using)
+
+
+@receiver(post_save, sender=MenuItem)
+def index_menuitem(sender, instance, using, **kwargs):
+    if in_catalog_batch():
+        return
+    index = menu_search_index(using)
+    if index is not None:
+        index.index([instance])
+
+
+@receiver(post_delete, sender=MenuItem)
+def unindex_menuitem(sender, instance, using, **kwargs):
+    if in_catalog_batch():
+        return
+    index = menu_search_index(using)
+    if index is not None:
+        index.remove([instance.pk])
+
+
+@receiver(post_save, sender=MenuItem)
+def reprice_carts(sender, instance, created, using, **kwargs):
+    """A menu price change re-prices the cart rows holding the item with one UPDATE."""
+    if in_catalog_batch():
+        return
+    if not created and instance.price != getattr(instance, '_loaded_price', None):
+        refresh_cart_prices([instance.pk], using=using)
+    instance._loaded_price = instance.price
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def refresh_order_totals(sender, instance, origin=None, **kwargs):
+    """Keep the order's items_count and total in step with edits to its items."""
+    if isinstance(origin, Order):
+        return  # The order itself is being deleted
+    orders = Order.objects.filter(pk=instance.order_id)
+    orders.refresh_totals()
+    bump_list_version('orders', *orders.values_list('user_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def refresh_item_sales(sender, instance, using, origin=None, **kwargs):
+    """Checkout updates the sales rollups itself; other edits of order items rebuild the day."""
+    if isinstance(origin, Order):
+        return
+    refresh_days(Order.objects.using(using).filter(pk=instance.order_id).values_list('date', flat=True), using)
+
+
+@receiver(post_save, sender=Order)
+def refresh_order_sales(sender, instance, created, using, **kwargs):
+    """Moving an order to another day, or changing its total, rebuilds the days involved."""
+    previous = getattr(instance, '_report_state', (None, None, None))
+    state = instance.report_state()
+    if not created and state != previous:
+        refresh_days([previous[0], state[0]], using)
+    instance._report_state = state
+
+
+@receiver(post_delete, sender=Order)
+def refresh_deleted_order_sales(sender, instance, using, **kwargs):
+    refresh_days([instance.date], using)
+
+
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_order_list(sender, instance, using, **kwargs):
+    """Any change to an order gives its customer's order list a new ETag."""
+    bump_list_version('orders', instance.user_id, using=using)
+
+
+@receiver(post_save, sender=Order)
+def record_order_change(sender, instance, created, using, **kwargs):
+    """Publish placed orders and status or delivery crew changes on the order change feed."""
+    previous = getattr(instance, '_feed_state', (None, None))
+    state = instance.feed_state()
+    if created or state != previous:
+        record_order_changes([(instance, previous[1], created)], using=using)
+        adjust_workloads(previous, state, using=using)
+        instance._feed_state = state
+
+
+@receiver(post_delete, sender=Order)
+def release_order_workload(sender, instance, using, **kwargs):
+    adjust_workloads(instance.feed_state(), (True, None), using=using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_membership(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """
+    Drop cached roles of users whose group membership changed, once the
+    change commits; dropping them earlier would let a concurrent request
+    cache the old roles again.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        user_pks = [instance.pk]
+    elif pk_set:
+        user_pks = list(pk_set)
+    else:
+        transaction.on_commit(invalidate_all_roles, using=using)
+        return
+    transaction.on_commit(lambda: invalidate_user_roles(*user_pks), using=using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def sync_crew_membership(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Joining or leaving the delivery crew creates or drops the member's workload row."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        sync_workloads([instance.pk], using=using)
+    elif instance.name == DELIVERY_CREW:
+        sync_workloads(pk_set, using=using)
+
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_groups(sender, using, **kwargs):
+    """Renaming or deleting a group can change the roles of any user."""
+    transaction.on_commit(invalidate_all_roles, using=using)
+
+
+@receiver([post_save, post_delete], sender=Group)
+def sync_crew_group(sender, using, **kwargs):
+    sync_workloads(using=using)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """Logging out deletes the token and logging in may issue a new one."""
+    token_cache().discard(instance.key)
+    token_cache().discard_user(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Deactivated or changed users must not be served from the token cache."""
+    token_cache().discard_user(instance.pk)
+
+
+@receiver(connection_created)
+def record_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
@@ -0,0 +1,149 @@
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxTask, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(tasks, using=None):
+    """
+    Add ``(dotted path, payload)`` tasks to the outbox with one INSERT.
+
+    Call it inside the transaction that makes the change the tasks follow
+    up on: they are written, and run, only if it commits. Once it does the
+    process's worker threads are woken to run them straight away.
+    """
+    using = using or router.db_for_write(OutboxTask)
+    created = OutboxTask.objects.using(using).bulk_create(
+        [OutboxTask(name=name, payload=payload) for name, payload in tasks])
+    if created:
+        transaction.on_commit(wake_worker, using=using)
+    return created
+
+
+def claim(limit, using=None):
+    """
+    Lease up to ``limit`` due tasks to this worker for TASK_LEASE seconds and
+    return them as ``(pk, name, payload, attempts)``.
+
+    The single UPDATE ... RETURNING re-checks the lease of every row it
+    changes, so concurrent workers never claim the same task. A worker that
+    dies mid-task leaves its lease to expire, after which the task is
+    claimed again: delivery is at least once.
+    """
+    using = using or router.db_for_write(OutboxTask)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = qn(OutboxTask._meta.db_table)
+    pk, status, run_after, locked_until, attempts, name, payload = (
+        qn(OutboxTask._meta.get_field(field).column)
+        for field in ['id', 'status', 'run_after', 'locked_until', 'attempts', 'name', 'payload']
+    )
+    now = timezone.now()
+    lease = now + timedelta(seconds=getattr(settings, 'TASK_LEASE', 300))
+    adapt = connection.ops.adapt_datetimefield_value
+    available = f'({locked_until} IS NULL OR {locked_until} < %s)'
+    sql = (
+        f'UPDATE {table} SET {locked_until} = %s, {attempts} = {attempts} + 1 '
+        f'WHERE {available} AND {pk} IN ('
+        f'SELECT {pk} FROM {table} WHERE {status} = %s AND {run_after} <= %s AND {available} '
+        f'ORDER BY {run_after}, {pk} LIMIT %s) '
+        f'RETURNING {pk}, {name}, {payload}, {attempts}'
+    )
+    payload_field = OutboxTask._meta.get_field('payload')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [adapt(lease), adapt(now), TaskStatus.PENDING, adapt(now), adapt(now), limit])
+        rows = cursor.fetchall()
+    return sorted((row[0], row[1], payload_field.from_db_value(row[2], None, connection), row[3]) for row in rows)
+
+
+def run_task(pk, name, payload, attempts, using=None):
+    """
+    Run one claimed task in a transaction. On success its row is deleted;
+    on failure it is retried after TASK_RETRY_DELAY seconds, doubling with
+    every attempt, and marked failed after TASK_MAX_ATTEMPTS.
+    """
+    using = using or router.db_for_write(OutboxTask)
+    tasks = OutboxTask.objects.using(using).filter(pk=pk)
+    try:
+        with transaction.atomic(using=using):
+            import_string(name)(**payload)
+    except Exception:
+        logger.exception('Task %s (%s) failed on attempt %d', pk, name, attempts)
+        retry = attempts < getattr(settings, 'TASK_MAX_ATTEMPTS', 5)
+        delay = getattr(settings, 'TASK_RETRY_DELAY', 10) * 2 ** (attempts - 1)
+        tasks.update(
+            status=TaskStatus.PENDING if retry else TaskStatus.FAILED,
+            run_after=timezone.now() + timedelta(seconds=delay),
+            locked_until=None,
+            last_error=traceback.format_exc()[-5000:],
+        )
+        return False
+    tasks.delete()
+    return True
+
+
+def run_pending(limit=100, using=None):
+    """Claim and run due tasks until there are none left; return how many ran."""
+    count = 0
+    while batch := claim(limit, using):
+        for task in batch:
+            run_task(*task, using=using)
+        count += len(batch)
+    return count
+
+
+class TaskWorker:
+    """
+    Threads that run outbox tasks in the web process, as soon as they are
+    woken after a commit and every TASK_POLL_INTERVAL seconds for retries.
+    Tasks left behind by a stopped process are run by the next worker to
+    poll, in this or another process, or by ``manage.py run_tasks``.
+    """
+
+    def __init__(self, threads, interval):
+        self.interval = interval
+        self.event = threading.Event()
+        self.threads = [
+            threading.Thread(target=self.loop, name=f'outbox-worker-{i}', daemon=True) for i in range(threads)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def wake(self):
+        self.event.set()
+
+    def loop(self):
+        while True:
+            self.event.wait(self.interval)
+            self.event.clear()
+            try:
+                run_pending()
+            except Exception:
+                logger.exception('Outbox worker failed')
+            finally:
+                connections.close_all()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def wake_worker():
+    """Start this process's worker threads if needed and have them run due tasks."""
+    global _worker
+    threads = getattr(settings, 'TASK_WORKER_THREADS', 2)
+    if not threads:
+        return
+    with _worker_lock:
+        if _worker is None:
+            _worker = TaskWorker(threads, getattr(settings, 'TASK_POLL_INTERVAL', 5))
+    _worker.wake()
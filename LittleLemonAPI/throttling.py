@@ -0,0 +1,207 @@
+import random
+import sqlite3
+import threading
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework import throttling
+from rest_framework.settings import api_settings
+
+from .instrumentation import timed
+
+
+def sliding_window(current, previous, elapsed, limit, duration):
+    """
+    Decide whether one more request fits a sliding-window counter.
+
+    ``current`` and ``previous`` are the requests counted in this fixed
+    window and the one before it, ``elapsed`` the seconds since this window
+    started. The previous window is weighted by how much of it still
+    overlaps the sliding window. Returns None if the request is allowed,
+    otherwise the number of seconds until it would be.
+    """
+    remaining = duration - elapsed
+    if previous * remaining / duration + current + 1 <= limit:
+        return None
+    if current + 1 > limit:
+        # Not before the next window starts, and then only once this
+        # window's count has partly slid out again
+        return remaining + duration * max(0.0, 1 - (limit - 1) / current) if current else remaining
+    return max(0.0, remaining - duration * (limit - 1 - current) / previous)
+
+
+class ThrottleStore:
+    """Keeps the two counters of each client's sliding window."""
+
+    def hit(self, key, limit, duration, now):
+        """Count a request if it fits; return None, or the seconds to wait if it doesn't."""
+        raise NotImplementedError
+
+    async def ahit(self, key, limit, duration, now):
+        return await sync_to_async(self.hit, thread_sensitive=False)(key, limit, duration, now)
+
+
+class CacheThrottleStore(ThrottleStore):
+    """
+    Counters in the ``THROTTLE_CACHE_ALIAS`` cache, one key per client and
+    window. Use a shared cache (Redis, Memcached) when running several
+    worker processes; there the increment is atomic, though two concurrent
+    requests can both pass the final slot of a window.
+    """
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def window_keys(key, duration, now):
+        window, elapsed = divmod(now, duration)
+        return f'{key}:{int(window)}', f'{key}:{int(window) - 1}', elapsed
+
+    def hit(self, key, limit, duration, now):
+        current_key, previous_key, elapsed = self.window_keys(key, duration, now)
+        counts = self.cache.get_many([current_key, previous_key])
+        wait = sliding_window(counts.get(current_key, 0), counts.get(previous_key, 0), elapsed, limit, duration)
+        if wait is None:
+            self.cache.add(current_key, 0, duration * 2)
+            try:
+                self.cache.incr(current_key)
+            except ValueError:
+                # Expired between add() and incr()
+                self.cache.set(current_key, 1, duration * 2)
+        return wait
+
+    async def ahit(self, key, limit, duration, now):
+        current_key, previous_key, elapsed = self.window_keys(key, duration, now)
+        counts = await self.cache.aget_many([current_key, previous_key])
+        wait = sliding_window(counts.get(current_key, 0), counts.get(previous_key, 0), elapsed, limit, duration)
+        if wait is None:
+            await self.cache.aadd(current_key, 0, duration * 2)
+            try:
+                await self.cache.aincr(current_key)
+            except ValueError:
+                await self.cache.aset(current_key, 1, duration * 2)
+        return wait
+
+
+class SQLiteThrottleStore(ThrottleStore):
+    """
+    Counters in a SQLite file (``THROTTLE_SQLITE_PATH``) shared by every
+    worker process on the host, one row per client. Each check runs in an
+    immediate transaction, so concurrent requests never overshoot the limit.
+    """
+    purge_probability = 0.001
+
+    def __init__(self, path=None):
+        self.path = str(path or getattr(settings, 'THROTTLE_SQLITE_PATH', settings.BASE_DIR / 'throttle.sqlite3'))
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle (key TEXT PRIMARY KEY, window INTEGER NOT NULL, '
+                'current INTEGER NOT NULL, previous INTEGER NOT NULL, expires REAL NOT NULL)'
+            )
+            self.local.connection = connection
+        return connection
+
+    def hit(self, key, limit, duration, now):
+        window, elapsed = divmod(now, duration)
+        window = int(window)
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT window, current, previous FROM throttle WHERE key = ?', (key,)).fetchone()
+            current = previous = 0
+            if row is not None and row[0] == window:
+                current, previous = row[1], row[2]
+            elif row is not None and row[0] == window - 1:
+                previous = row[1]
+            wait = sliding_window(current, previous, elapsed, limit, duration)
+            if wait is None:
+                connection.execute(
+                    'INSERT INTO throttle (key, window, current, previous, expires) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (key) DO UPDATE SET window = excluded.window, current = excluded.current, '
+                    'previous = excluded.previous, expires = excluded.expires',
+                    (key, window, current + 1, previous, (window + 2) * duration),
+                )
+            if random.random() < self.purge_probability:
+                connection.execute('DELETE FROM throttle WHERE expires < ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+
+@lru_cache(maxsize=None)
+def load_store(path):
+    return import_string(path)()
+
+
+def throttle_store():
+    return load_store(getattr(settings, 'THROTTLE_STORE', 'LittleLemonAPI.throttling.CacheThrottleStore'))
+
+
+class SlidingWindowRateThrottle(throttling.SimpleRateThrottle):
+    """
+    Rate throttle on a sliding-window counter: two integers per client
+    instead of DRF's list of request timestamps, kept in the configured
+    THROTTLE_STORE.
+
+    A view can set ``throttle_scope`` to give its route its own limits;
+    the rates ``'<scope>.<throttle_scope>'`` (e.g. ``'user.orders'``) apply
+    to it when configured, the throttle's plain scope otherwise.
+    """
+    wait_time = None
+
+    def get_rate(self):
+        # Read the rates on each use so that settings overrides apply
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def select_scope(self, view):
+        route_scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{self.scope}.{route_scope}') if route_scope else None
+        if rate is not None:
+            self.scope, self.rate = f'{self.scope}.{route_scope}', rate
+            self.num_requests, self.duration = self.parse_rate(rate)
+
+    def get_key(self, request, view):
+        self.select_scope(view)
+        if self.rate is None:
+            return None
+        return self.get_cache_key(request, view)
+
+    def allow_request(self, request, view):
+        with timed('throttle_time'):
+            key = self.get_key(request, view)
+            if key is None:
+                return True
+            self.wait_time = throttle_store().hit(key, self.num_requests, self.duration, self.timer())
+            return self.wait_time is None
+
+    async def aallow_request(self, request, view):
+        with timed('throttle_time'):
+            key = self.get_key(request, view)
+            if key is None:
+                return True
+            self.wait_time = await throttle_store().ahit(key, self.num_requests, self.duration, self.timer())
+            return self.wait_time is None
+
+    def wait(self):
+        return self.wait_time
+
+
+class AnonRateThrottle(SlidingWindowRateThrottle, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(SlidingWindowRateThrottle, throttling.UserRateThrottle):
+    pass
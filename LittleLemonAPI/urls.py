@@ -1,16 +1,35 @@
+from django.conf import settings
 from django.urls import path, include
 
-from . import views
+from . import async_views, views
+
+
+def read_view(async_view_class):
+    """The async view under ASGI (see ASYNC_VIEWS), otherwise the sync view it hands writes to."""
+    if settings.ASYNC_VIEWS:
+        return async_view_class.as_view()
+    return async_view_class.sync_view_class.as_view()
+
 
 urlpatterns = [
-    path('menu-items', views.MenuItemView.as_view()),
-    path('menu-items/<int:pk>', views.MenuDetailView.as_view()),
-    path('categories', views.CategoryView.as_view()), 
+    path('menu-items/bulk', views.MenuItemBulkView.as_view()),
+    path('menu-items/export', views.MenuItemExportView.as_view()),
+    path('categories/bulk', views.CategoryBulkView.as_view()),
+    path('categories/export', views.CategoryExportView.as_view()),
+    path('menu-items', read_view(async_views.MenuItemAsyncView)),
+    path('menu-items/<int:pk>', read_view(async_views.MenuDetailAsyncView)),
+    path('categories', read_view(async_views.CategoryAsyncView)), 
     path('orders', views.OrderView.as_view()),
+    path('orders/changes', read_view(async_views.OrderChangeAsyncView)),
+    path('orders/assign', views.OrderAssignmentView.as_view()),
     path('orders/<int:pk>', views.OrderDetailView.as_view()),
+    path('reports/sales', views.DailySalesReportView.as_view()),
+    path('reports/menu-items', views.MenuItemSalesReportView.as_view()),
+    path('reports/categories', views.CategorySalesReportView.as_view()),
 
     
     path('cart/menu-items', views.CartView.as_view()),
+    path('cart/menu-items/bulk', views.CartBulkView.as_view()),
    path('groups/manager/users', views.ManagerUserView.as_view(), name='manager_user_list'),
     path('groups/manager/users/<int:userId>', views.ManagerUserDetailView.as_view(), name='manager_user_detail'),
     path('groups/delivery-crew/users', views.DeliveryCrewUserView.as_view(), name='delivery_crew_user_list'),
@@ -1,20 +1,45 @@
+from collections.abc import Iterator
 
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import generics, status,filters
 from rest_framework.response import Response
-from .models import Category, Order, MenuItem, OrderItem, Cart
-from .serializers import MenuItemSerializer, CategorySerializer, OrderSerializer, CartSerializer
+from .models import Category, CrewWorkload, Order, MenuItem, OrderItem, Cart
+from .serializers import (
+    BulkDeleteSerializer, MenuItemSerializer, CategorySerializer, OrderSerializer, OrderAssignmentSerializer,
+    CartSerializer, CartBulkItemSerializer, CategorySalesSerializer, DailySalesSerializer, MenuItemSalesSerializer,
+    SalesReportQuerySerializer, SalesTotalSerializer, expands,
+)
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User, Group
+from rest_framework.parsers import JSONParser
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
-
-class CategoryView(generics.ListCreateAPIView):
+from rest_framework.exceptions import ValidationError
+from .assignment import NoDeliveryCrewError, assign_orders
+from .cache import CatalogCacheMixin, ListETagMixin, bump_list_version
+from .catalog import BulkCategories, BulkDeleteError, BulkImportError, BulkMenuItems
+from .fast_serializers import RowSerializerListMixin
+from .feed import feed_page, feed_params, feed_response_data, latest_sequence
+from .pagination import KeysetPagination
+from .parsers import CSVParser, NDJSONParser
+from .renderers import CSVRenderer, NDJSONRenderer
+from .search import FullTextSearchFilter
+from .throttling import AnonRateThrottle, UserRateThrottle
+from .permissions import IsManager, IsManagerOrReadOnly, request_roles
+from .reporting import category_sales, daily_sales, menu_item_sales
+from .routers import ReplicaReadsMixin
+from .services import (
+    MAX_CART_QUANTITY, EmptyCartError, UnknownMenuItemsError, add_to_cart, checkout, update_cart,
+)
+
+class CategoryView(ReplicaReadsMixin, CatalogCacheMixin, RowSerializerListMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'catalog'
     def get_permissions(self):
         """
         Allow GET requests without authentication (anonymous access).
@@ -25,190 +50,326 @@ class CategoryView(generics.ListCreateAPIView):
         return [IsAuthenticated()]  # Apply IsAuthenticated for other methods
 
 
-class MenuItemView(generics.ListCreateAPIView):
+class MenuItemView(ReplicaReadsMixin, CatalogCacheMixin, RowSerializerListMixin, generics.ListCreateAPIView):
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'catalog'
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter,filters.OrderingFilter]
+    # Full-text search runs last so it can rank results when no ordering is requested
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_fields = {
         'category': ['exact'],
         'price': ['exact', 'gt', 'lt'],  
     }
     search_fields = ['title']
     ordering_fields = ['price', 'featured']
+    ordering = ['id']
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         """
         Allow GET requests without authentication (anonymous access).
-        For POST, PUT, DELETE methods, authentication is required.
+        Creating menu items is restricted to managers.
         """
         if self.request.method == 'GET':
             return []  # No permissions needed for GET (anonymous access)
-        return [IsAuthenticated()]  # Apply IsAuthenticated for other methods
-
+        return [IsAuthenticated(), IsManager()]
 
-    def post(self, request, *args, **kwargs):
-        # Ensure only managers can create menu items
-        if not request.user.groups.filter(name='Manager').exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        return super().post(request, *args, **kwargs)
-
-    def put(self, request, *args, **kwargs):
-        # Ensure only managers can update menu items
-        if not request.user.groups.filter(name='Manager').exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        return super().put(request, *args, **kwargs)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return queryset.select_related('category') if expands(self.request, 'category') else queryset
 
-    def delete(self, request, *args, **kwargs):
-        # Ensure only managers can delete menu items
-        if not request.user.groups.filter(name='Manager').exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        return super().delete(request, *args, **kwargs)
-    
     def get(self, request, *args, **kwargs):
         # Allow all users to view menu items
         return super().get(request, *args, **kwargs)
 
-class OrderView(generics.ListCreateAPIView):
+class OrderView(ReplicaReadsMixin, ListETagMixin, RowSerializerListMixin, generics.ListCreateAPIView):
     serializer_class = OrderSerializer
     queryset = Order.objects.all()
     filter_backends = [DjangoFilterBackend, filters.SearchFilter,filters.OrderingFilter]
     filterset_fields = ['status'] 
     search_fields = ['id', 'user__username'] 
     ordering_fields = ['date', 'total'] 
+    ordering = ['-date']
+    pagination_class = KeysetPagination
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'orders'
+    etag_list = 'orders'
 
  
     def get_queryset(self):
         """Filter orders based on the authenticated user."""
-        return Order.objects.filter(user=self.request.user)
+        queryset = Order.objects.filter(user=self.request.user)
+        # Summaries (?fields= without expanding order_items) never touch OrderItem
+        return queryset.with_items() if expands(self.request, 'order_items') else queryset
 
     def perform_create(self, serializer):
         # Handle order creation, including cart processing and order item creation
-        user = self.request.user
-        cart_items = Cart.objects.filter(user=user)
-        
-        if not cart_items:
-            return Response({'detail': 'No items in the cart to place an order.'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        total_price = sum(item.price for item in cart_items)
-        order = serializer.save(user=user, total=total_price)
-        
-        order_items = [OrderItem(
-            order=order,
-            menuitem=cart_item.menuitem,
-            quantity=cart_item.quantity,
-            unit_price=cart_item.unit_price,
-            price=cart_item.price
-        ) for cart_item in cart_items]
-
-        OrderItem.objects.bulk_create(order_items)
-        cart_items.delete()
-        
-        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+        order_fields = {k: v for k, v in serializer.validated_data.items() if k != 'user'}
+        try:
+            serializer.instance = checkout(self.request.user, **order_fields)
+        except EmptyCartError as exc:
+            raise ValidationError({'detail': str(exc)})
 
 class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'orders'
+
+    def get_queryset(self):
+        return self.queryset.with_items() if expands(self.request, 'order_items') else self.queryset
  
 
+class OrderAssignmentView(APIView):
+    """Assign waiting orders to the delivery crew in one batch (managers only)."""
+    permission_classes = [IsAuthenticated, IsManager]
+    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'orders'
 
-class MenuDetailView(generics.RetrieveUpdateDestroyAPIView):
+    def post(self, request):
+        serializer = OrderAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            counts = assign_orders(**serializer.validated_data)
+        except NoDeliveryCrewError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response({
+            'assigned': sum(counts.values()),
+            'delivery_crew': [{'id': pk, 'assigned': n} for pk, n in sorted(counts.items())],
+        })
+
+
+class OrderChangeView(APIView):
+    """
+    The order change feed: entries after ``?since=<seq>``, oldest first, up
+    to ``?limit=``. Without ``since`` the current position of the feed is
+    returned, so a client can first list the orders and then follow changes
+    from there. Under ASGI token clients are served by OrderChangeAsyncView,
+    which can also wait for changes; this view always answers straight away.
+    """
     permission_classes = [IsAuthenticated]
-    queryset = MenuItem.objects.all()
-    serializer_class = MenuItemSerializer
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'order_feed'
 
+    def get(self, request):
+        since, _, limit = feed_params(request.query_params)
+        if since is None:
+            return Response(feed_response_data(latest_sequence(), []))
+        results = feed_page(request.user, request_roles(request), since, limit)
+        return Response(feed_response_data(since, results))
+
+
+class CatalogBulkView(APIView):
+    """
+    Create or update many rows at once (managers only). POST takes a JSON
+    list, or an NDJSON or CSV body that is read as it is imported; rows with
+    an ``id`` update that row. DELETE takes ``{"ids": [...]}``. Either the
+    whole request is applied or nothing is.
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'catalog'
+    parser_classes = [JSONParser, NDJSONParser, CSVParser]
+    bulk_class = None
 
-    def post(self, request, *args, **kwargs):
-        # Ensure only managers can create menu items
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        return super().post(request, *args, **kwargs)
-
-    def put(self, request, *args, **kwargs):
-        # Ensure only managers can update menu items
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        return super().put(request, *args, **kwargs)
-
-    def patch(self, request, *args, **kwargs):
-        # Ensure only managers can partially update menu items
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        return super().patch(request, *args, **kwargs)
+    def post(self, request):
+        rows = request.data
+        # A JSON list, or the lazy row iterator of the NDJSON and CSV parsers
+        if not isinstance(rows, (list, Iterator)):
+            return Response({'detail': 'Expected a list of rows.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = self.bulk_class().save(rows)
+        except BulkImportError as exc:
+            return Response({'errors': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+    def delete(self, request):
+        serializer = BulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            deleted = self.bulk_class().delete(serializer.validated_data['ids'])
+        except BulkDeleteError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response({'deleted': deleted})
 
-    def delete(self, request, *args, **kwargs):
-        # Ensure only managers can delete menu items
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        return super().delete(request, *args, **kwargs)
 
-class CartView(generics.ListCreateAPIView):
+class MenuItemBulkView(CatalogBulkView):
+    bulk_class = BulkMenuItems
+
+
+class CategoryBulkView(CatalogBulkView):
+    bulk_class = BulkCategories
+
+
+class CatalogExportView(APIView):
+    """
+    Stream every row as NDJSON or CSV (``Accept`` or ``?format=``), in the
+    shape the bulk endpoint imports. Rows are read in chunks as the response
+    is sent, from the event loop when served over ASGI.
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'catalog'
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    bulk_class = None
+    filename = None
+
+    def get(self, request):
+        bulk = self.bulk_class()
+        renderer = request.accepted_renderer
+        if isinstance(request._request, ASGIRequest):
+            content = renderer.astream(bulk.aexport(), bulk.fields)
+        else:
+            content = renderer.stream(bulk.export(), bulk.fields)
+        content_type = renderer.media_type + (f'; charset={renderer.charset}' if renderer.charset else '')
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{renderer.format}"'
+        return response
+
+
+class MenuItemExportView(CatalogExportView):
+    bulk_class = BulkMenuItems
+    filename = 'menu-items'
+
+
+class CategoryExportView(CatalogExportView):
+    bulk_class = BulkCategories
+    filename = 'categories'
+
+
+class SalesReportView(ReplicaReadsMixin, APIView):
+    """
+    Sales between ``?start=`` and ``?end=`` (inclusive, the last
+    REPORTS_DEFAULT_DAYS days by default), read from the daily rollups
+    rather than aggregated over the orders. Managers only.
+    """
+    permission_classes = [IsAuthenticated, IsManager]
+    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'reports'
+
+    def get(self, request):
+        params = SalesReportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data['start'], params.validated_data['end']
+        return Response({'start': start, 'end': end, **self.report(start, end, params.validated_data)})
+
+
+class DailySalesReportView(SalesReportView):
+    """Orders, items and revenue per day, and over the whole range."""
+
+    def report(self, start, end, params):
+        days, total = daily_sales(start, end)
+        return {
+            'total': SalesTotalSerializer({name: value or 0 for name, value in total.items()}).data,
+            'days': DailySalesSerializer(days, many=True).data,
+        }
+
+
+class MenuItemSalesReportView(SalesReportView):
+    """The best selling menu items by ``?ordering=`` (revenue, quantity or orders), up to ``?limit=``."""
+
+    def report(self, start, end, params):
+        rows = menu_item_sales(start, end, params['ordering'], params['limit'])
+        return {'results': MenuItemSalesSerializer(rows, many=True).data}
+
+
+class CategorySalesReportView(SalesReportView):
+    """Quantity and revenue per category, highest revenue first."""
+
+    def report(self, start, end, params):
+        return {'results': CategorySalesSerializer(category_sales(start, end), many=True).data}
+
+
+class MenuDetailView(ReplicaReadsMixin, generics.RetrieveUpdateDestroyAPIView):
+    # Any authenticated user can view menu items; only managers can change them
+    permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
+    queryset = MenuItem.objects.all()
+    serializer_class = MenuItemSerializer
+    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'catalog'
+
+class CartView(ListETagMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = CartSerializer
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'cart'
+    etag_list = 'cart'
 
 
     def get_queryset(self):
         """Get all cart items for the authenticated user."""
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user=self.request.user).select_related('menuitem__category')
 
-    def perform_create(self, serializer):
+    def create(self, request, *args, **kwargs):
         """Add or update menu items in the user's cart."""
-        user = self.request.user
-        menuitem_id = self.request.data.get('menuitem_id')
-        
+        menuitem_id = request.data.get('menuitem_id')
+        quantity = request.data.get('quantity', 1)
+
         try:
-            menuitem = MenuItem.objects.get(id=menuitem_id)
-        except MenuItem.DoesNotExist:
+            menuitem_id = int(menuitem_id)
+        except (TypeError, ValueError):
             return Response({'detail': 'Menu item not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        quantity = self.request.data.get('quantity', 1)
-        
         try:
             quantity = int(quantity)
-        except ValueError:
+        except (TypeError, ValueError):
             return Response({'detail': 'Quantity must be a valid number.'}, status=status.HTTP_400_BAD_REQUEST)
+        if quantity < 1:
+            return Response({'detail': 'Quantity must be at least 1.'}, status=status.HTTP_400_BAD_REQUEST)
+        if quantity > MAX_CART_QUANTITY:
+            return Response(
+                {'detail': f'Quantity must be at most {MAX_CART_QUANTITY}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        cart_item, created = add_to_cart(request.user, menuitem_id, quantity)
+        if cart_item is None:
+            return Response({'detail': 'Menu item not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        existing_cart_item = Cart.objects.filter(user=user, menuitem=menuitem).first()
-        
-        if existing_cart_item:
-            existing_cart_item.quantity += quantity
-            existing_cart_item.price = existing_cart_item.unit_price * existing_cart_item.quantity
-            existing_cart_item.save()
-            return Response(CartSerializer(existing_cart_item).data, status=status.HTTP_200_OK)
-
-        cart_item = serializer.save(user=user, menuitem=menuitem, quantity=quantity)
-        return Response(CartSerializer(cart_item).data, status=status.HTTP_201_CREATED)
+        return Response(
+            CartSerializer(cart_item).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
 
     def delete(self, request, *args, **kwargs):
         """Delete all cart items for the authenticated user."""
         Cart.objects.filter(user=self.request.user).delete()
+        bump_list_version('cart', self.request.user.pk)
         return Response({'detail': 'All cart items deleted.'}, status=status.HTTP_204_NO_CONTENT)
 
+class CartBulkView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'cart'
+
+
+    def post(self, request):
+        """Set the quantity of many cart items in one request; quantity 0 removes an item."""
+        serializer = CartBulkItemSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        quantities = {op['menuitem_id']: op['quantity'] for op in serializer.validated_data}
+
+        try:
+            cart_items = update_cart(request.user, quantities)
+        except UnknownMenuItemsError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(CartSerializer(cart_items, many=True).data)
+
  #APIView is used  beacuse its simple to do customization than genericView
 class ManagerUserView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsManager]
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'groups'
 
 
     def get(self, request):
         """Returns all users in the 'Manager' group."""
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        
         managers = User.objects.filter(groups__name="Manager")
         users_data = [{"id": user.id, "username": user.username} for user in managers]
         return Response(users_data)
 
     def post(self, request):
         """Assign a user to the 'Manager' group."""
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        
         user_id = request.data.get('user_id')
         try:
             user = User.objects.get(id=user_id)
@@ -222,15 +383,13 @@ class ManagerUserView(APIView):
 
 
 class ManagerUserDetailView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsManager]
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'groups'
 
 
     def delete(self, request, userId):
         """Remove a user from the 'Manager' group."""
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        
         try:
             user = User.objects.get(id=userId)
             manager_group = Group.objects.get(name="Manager")
@@ -243,27 +402,23 @@ class ManagerUserDetailView(APIView):
 
 
 class DeliveryCrewUserView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsManager]
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'groups'
 
 
     def get(self, request):
-        """Returns all users in the 'Delivery crew' group."""
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-
-        # Debug: Print the list of users in the "Delivery crew" group
-        delivery_crew = User.objects.filter(groups__name="Delivery crew")
-        print("Delivery crew Users:", delivery_crew)  # This will print the QuerySet to the console
-        users_data = [{"id": user.id, "username": user.username} for user in delivery_crew]
+        """Returns all users in the 'Delivery crew' group with their open order counts."""
+        workloads = CrewWorkload.objects.select_related('user').order_by('user_id')
+        users_data = [
+            {"id": workload.user_id, "username": workload.user.username, "open_orders": workload.open_orders}
+            for workload in workloads
+        ]
         return Response(users_data)
 
 
     def post(self, request):
         """Assign a user to the 'Delivery crew' group."""
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        
         user_id = request.data.get('user_id')
         try:
             user = User.objects.get(id=user_id)
@@ -277,15 +432,13 @@ class DeliveryCrewUserView(APIView):
 
 
 class DeliveryCrewUserDetailView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsManager]
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'groups'
 
 
     def delete(self, request, userId):
         """Remove a user from the 'Delivery crew' group."""
-        if not request.user.groups.filter(name="Manager").exists():
-            return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
-        
         try:
             user = User.objects.get(id=userId)
             delivery_crew_group = Group.objects.get(name="Delivery crew")
@@ -299,6 +452,7 @@ class DeliveryCrewUserDetailView(APIView):
 class LogoutView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
+    throttle_scope = 'auth'
 
 
     def post(self, request, *args, **kwargs):
@@ -0,0 +1,64 @@
+"""
+Compare the catalog read endpoints under a WSGI (gunicorn) and an ASGI
+(uvicorn) deployment.
+
+    python -m benchmarks.asgi_vs_wsgi --menu-items 2000 --concurrency 32 --requests 5000
+
+The script seeds benchmarks/settings.py's database, starts each server in
+turn on a local port, replays anonymous GETs against the menu and category
+lists and prints p50/p99 latency and requests per second. Pass
+--no-catalog-cache to measure the database path instead of cache hits.
+Requires gunicorn and uvicorn to be installed.
+"""
+import argparse
+import os
+
+from .loadgen import run_load
+from .seed import seed
+from .servers import SETTINGS, serve, server_command
+
+CATALOG_REQUESTS = [
+    ('GET', '/api/menu-items', None),
+    ('GET', '/api/menu-items?ordering=price&page=2', None),
+    ('GET', '/api/menu-items?category=1&price__lt=20.00', None),
+    ('GET', '/api/categories', None),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--menu-items', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--no-catalog-cache', action='store_true')
+    args = parser.parse_args(argv)
+
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': SETTINGS}
+    if args.no_catalog_cache:
+        env['BENCH_CATALOG_CACHE'] = 'off'
+        os.environ['BENCH_CATALOG_CACHE'] = 'off'
+    seed(menu_items=args.menu_items)
+
+    bind = f'127.0.0.1:{args.port}'
+    deployments = {
+        'wsgi (gunicorn)': server_command('gunicorn', args.port, args.workers, args.threads),
+        'asgi (uvicorn)': server_command('uvicorn', args.port, args.workers),
+    }
+
+    print(f"{'deployment':<18} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+    for name, command in deployments.items():
+        process = serve(command, args.port, env)
+        try:
+            run_load(f'http://{bind}', CATALOG_REQUESTS, args.concurrency, min(200, args.requests))  # warm up
+            result = run_load(f'http://{bind}', CATALOG_REQUESTS, args.concurrency, args.requests)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{name:<18} {result['rps']:>9.1f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}  {result['statuses']}")
+
+
+if __name__ == '__main__':
+    main()
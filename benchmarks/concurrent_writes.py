@@ -0,0 +1,121 @@
+"""
+Compare concurrent checkout and cart write throughput on SQLite with its
+default settings and with the WAL profile from LittleLemon/databases.py.
+
+    python -m benchmarks.concurrent_writes --threads 16 --seconds 10
+
+Every thread adds two menu items to its own user's cart and checks it out,
+in a loop, for --seconds per profile. The default profile runs with the
+rollback journal, deferred transactions and without lock retries; the WAL
+profile with WAL, IMMEDIATE transactions, the busy timeout and retries.
+For each profile the script prints the checkouts and cart writes per
+second, the writes that failed with "database is locked" and the p50 and
+p99 checkout latency.
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from datetime import date
+
+from .seed import seed
+
+PROFILES = ['default', 'wal']
+
+
+def configure(profile):
+    """Point new connections at ``profile`` and turn lock retries on or off to match."""
+    from django.conf import settings
+    from django.db import connections
+
+    from LittleLemon.databases import sqlite_options
+
+    connections.close_all()
+    options = sqlite_options(profile)
+    if profile == 'default':
+        # journal_mode is stored in the database file; go back to the rollback journal
+        options = {'init_command': 'PRAGMA journal_mode=DELETE'}
+    connections.settings['default']['OPTIONS'] = options
+    settings.DATABASE_LOCK_RETRIES = 0 if profile == 'default' else 5
+
+
+def run(profile, users, menuitem_ids, seconds):
+    from django.db import OperationalError, connections
+
+    from LittleLemonAPI.models import Cart
+    from LittleLemonAPI.retries import is_lock_error
+    from LittleLemonAPI.services import EmptyCartError, add_to_cart, checkout
+
+    configure(profile)
+    Cart.objects.filter(user__in=users).delete()
+    connections.close_all()
+    barrier = threading.Barrier(len(users) + 1)
+    results = {'checkouts': 0, 'cart_writes': 0, 'locked': 0}
+    latencies = []
+    lock = threading.Lock()
+    deadline = [0.0]
+
+    def worker(user):
+        checkouts = cart_writes = locked = 0
+        timings = []
+        barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            try:
+                for menuitem_id in random.sample(menuitem_ids, 2):
+                    add_to_cart(user, menuitem_id, 1)
+                    cart_writes += 1
+                start = time.perf_counter()
+                checkout(user, date=date.today())
+                timings.append(time.perf_counter() - start)
+                checkouts += 1
+            except EmptyCartError:
+                pass
+            except OperationalError as exc:
+                if not is_lock_error(exc):
+                    raise
+                locked += 1
+        connections.close_all()
+        with lock:
+            results['checkouts'] += checkouts
+            results['cart_writes'] += cart_writes
+            results['locked'] += locked
+            latencies.extend(timings)
+
+    threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + seconds
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    p50 = statistics.median(latencies) if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+    return results, p50, p99
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--menu-items', type=int, default=1000)
+    args = parser.parse_args(argv)
+    seed(menu_items=args.menu_items, users=args.threads)
+
+    from django.contrib.auth.models import User
+
+    from LittleLemonAPI.models import MenuItem
+
+    users = list(User.objects.filter(username__startswith='bench-user-').order_by('pk')[:args.threads])
+    menuitem_ids = list(MenuItem.objects.values_list('pk', flat=True))
+    print(f"{'profile':<9} {'checkouts/s':>12} {'cart writes/s':>14} {'locked':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for profile in PROFILES:
+        results, p50, p99 = run(profile, users, menuitem_ids, args.seconds)
+        print(f"{profile:<9} {results['checkouts'] / args.seconds:>12.1f} "
+              f"{results['cart_writes'] / args.seconds:>14.1f} {results['locked']:>7} "
+              f'{p50 * 1000:>8.2f} {p99 * 1000:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Minimal closed-loop HTTP load generator used by the benchmark scripts."""
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, statuses, elapsed):
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': statistics.fmean(latencies) if latencies else 0.0,
+        'statuses': statuses,
+    }
+
+
+def run_load(base_url, requests, concurrency, total, headers=None):
+    """
+    Replay ``requests`` round-robin from ``concurrency`` threads until
+    ``total`` requests have completed. Each request is a (method, path, body)
+    tuple with an optional fourth element of extra headers.
+
+    Each thread keeps one persistent connection. Returns a dict with overall
+    throughput, latency percentiles in milliseconds and status code counts,
+    plus the same figures per request under 'endpoints'.
+    """
+    parts = urlsplit(base_url)
+    latencies = [[] for _ in requests]
+    statuses = [{} for _ in requests]
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def connect():
+        return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+    def worker():
+        connection = connect()
+        local = [([], {}) for _ in requests]
+        for i in counter:
+            index = i % len(requests)
+            method, path, body, *extra = requests[index]
+            request_headers = {**(headers or {}), **(extra[0] if extra else {})}
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=request_headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = connect()
+                status = 'error'
+            local[index][0].append((time.perf_counter() - start) * 1000)
+            local[index][1][status] = local[index][1].get(status, 0) + 1
+        connection.close()
+        with lock:
+            for index, (local_latencies, local_statuses) in enumerate(local):
+                latencies[index].extend(local_latencies)
+                for status, count in local_statuses.items():
+                    statuses[index][status] = statuses[index].get(status, 0) + count
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    overall_statuses = {}
+    for endpoint_statuses in statuses:
+        for status, count in endpoint_statuses.items():
+            overall_statuses[status] = overall_statuses.get(status, 0) + count
+    result = summarize([ms for endpoint in latencies for ms in endpoint], overall_statuses, elapsed)
+    result['endpoints'] = [summarize(lat, st, elapsed) for lat, st in zip(latencies, statuses)]
+    return result
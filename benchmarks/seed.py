@@ -0,0 +1,90 @@
+"""Seed the benchmark database with users, a menu and order history at a given scale."""
+import os
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+BATCH_SIZE = 5000
+PASSWORD = 'bench-password'
+UNIT_PRICE = Decimal('4.99')
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+
+
+def seed(menu_items=1000, orders=0, users=20, items_per_order=2):
+    """
+    Bring the benchmark database up to the requested scale and return the
+    seeded tokens as {'customer': key, 'manager': key}. Existing rows are
+    kept, so repeated runs only add what is missing.
+    """
+    setup()
+    from django.contrib.auth.models import Group, User
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem
+
+    call_command('migrate', verbosity=0)
+    manager_group, _ = Group.objects.get_or_create(name='Manager')
+    Group.objects.get_or_create(name='Delivery crew')
+
+    existing = set(User.objects.values_list('username', flat=True))
+    User.objects.bulk_create([
+        User(username=f'bench-user-{i}', password='!') for i in range(users) if f'bench-user-{i}' not in existing
+    ])
+    if 'bilitade' not in existing:
+        User.objects.create_user('bilitade', password='12345678')
+    manager, _ = User.objects.get_or_create(username='bench-manager')
+    customer, _ = User.objects.get_or_create(username='bench-customer')
+    for user in (manager, customer):
+        if not user.has_usable_password():
+            user.set_password(PASSWORD)
+            user.save(update_fields=['password'])
+    manager.groups.add(manager_group)
+
+    categories = [
+        Category.objects.get_or_create(slug=f'category-{i}', defaults={'title': f'Category {i}'})[0]
+        for i in range(20)
+    ]
+    count = MenuItem.objects.count()
+    for start in range(count, menu_items, BATCH_SIZE):
+        MenuItem.objects.bulk_create([
+            MenuItem(title=f'Menu item {i}', price=Decimal(i % 50) + Decimal('0.99'),
+                     featured=i % 7 == 0, category=categories[i % len(categories)])
+            for i in range(start, min(start + BATCH_SIZE, menu_items))
+        ])
+    if MenuItem.objects.count() != count:
+        call_command('rebuild_search_index', verbosity=0)
+
+    rng = random.Random(42)
+    menu_ids = list(MenuItem.objects.values_list('pk', flat=True)[:500])
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    start_date = date(2020, 1, 1)
+    for start in range(Order.objects.count(), orders, BATCH_SIZE):
+        size = min(BATCH_SIZE, orders - start)
+        lines = [
+            [(menuitem_id, rng.randint(1, 3)) for menuitem_id in rng.sample(menu_ids, min(items_per_order, len(menu_ids)))]
+            for _ in range(size)
+        ]
+        # Every tenth order belongs to the benchmark customer so its history grows with scale
+        batch = Order.objects.bulk_create([
+            Order(user_id=customer.pk if (start + i) % 10 == 0 else rng.choice(user_ids),
+                  status=rng.random() < 0.7, total=UNIT_PRICE * sum(q for _, q in order_lines),
+                  items_count=sum(q for _, q in order_lines),
+                  date=start_date + timedelta(days=rng.randrange(1500)))
+            for i, order_lines in enumerate(lines)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem_id=menuitem_id, quantity=quantity,
+                      unit_price=UNIT_PRICE, price=UNIT_PRICE * quantity)
+            for order, order_lines in zip(batch, lines) for menuitem_id, quantity in order_lines
+        ])
+
+    return {
+        'customer': Token.objects.get_or_create(user=customer)[0].key,
+        'manager': Token.objects.get_or_create(user=manager)[0].key,
+    }
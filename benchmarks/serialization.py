@@ -0,0 +1,63 @@
+"""
+Compare DRF's serializers and JSONRenderer with RowSerializer and
+ORJSONRenderer on large pages.
+
+    python -m benchmarks.serialization --rows 1000 --repeat 20
+
+For menu items (with their category) and orders (with their items) the
+script builds one page of --rows rows both ways, from the query through to
+the rendered bytes. It checks that the bytes are identical and prints the
+best time of --repeat runs for each.
+"""
+import argparse
+import time
+
+from .seed import seed
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+    seed(menu_items=args.rows, orders=args.rows * 10)
+
+    from rest_framework.renderers import JSONRenderer
+
+    from LittleLemonAPI.fast_serializers import RowSerializer
+    from LittleLemonAPI.models import MenuItem, Order
+    from LittleLemonAPI.renderers import ORJSONRenderer
+    from LittleLemonAPI.serializers import MenuItemSerializer, OrderSerializer
+
+    cases = {
+        'menu items': (MenuItemSerializer, MenuItem.objects.select_related('category').order_by('id')),
+        'orders': (OrderSerializer, Order.objects.with_items().order_by('id')),
+    }
+    print(f"{'page of ' + str(args.rows):<16} {'DRF ms':>9} {'rows ms':>9} {'speedup':>8}")
+    for name, (serializer_class, queryset) in cases.items():
+        page = queryset[:args.rows]
+        rows = RowSerializer(serializer_class())
+
+        def drf():
+            return JSONRenderer().render(serializer_class(list(page), many=True).data)
+
+        def fast():
+            return ORJSONRenderer().render(rows.serialize(rows.values(page)))
+
+        if drf() != fast():
+            raise SystemExit(f'{name}: outputs differ')
+        slow, quick = best_of(args.repeat, drf), best_of(args.repeat, fast)
+        print(f'{name:<16} {slow * 1000:>9.2f} {quick * 1000:>9.2f} {slow / quick:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Start local WSGI/ASGI servers for the benchmark scripts."""
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SETTINGS = 'benchmarks.settings'
+
+
+def server_command(kind, port, workers=1, threads=8):
+    if kind == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', 'LittleLemon.wsgi:application', '-b', f'127.0.0.1:{port}',
+                '-w', str(workers), '--threads', str(threads)]
+    if kind == 'uvicorn':
+        return [sys.executable, '-m', 'uvicorn', 'LittleLemon.asgi:application', '--host', '127.0.0.1',
+                '--port', str(port), '--workers', str(workers), '--no-access-log']
+    raise ValueError(f'unknown server {kind!r}')
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def serve(command, port, env):
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
@@ -0,0 +1,33 @@
+"""
+Settings for benchmark runs: a separate SQLite database, no debug query
+logging and throttling rates high enough not to interfere with the load.
+"""
+import os
+
+from LittleLemon.settings import *  # noqa: F401,F403
+from LittleLemon.databases import sqlite_options
+from LittleLemon.settings import BASE_DIR, CACHES, REST_FRAMEWORK
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCH_DATABASE', BASE_DIR / 'bench.sqlite3'),
+        'OPTIONS': sqlite_options(os.environ.get('BENCH_SQLITE_PROFILE', 'wal')),
+    }
+}
+DATABASE_REPLICAS = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'anon': '1000000/second', 'user': '1000000/second'},
+}
+
+# e.g. BENCH_THROTTLE_STORE=LittleLemonAPI.throttling.SQLiteThrottleStore to share counters between workers
+THROTTLE_STORE = os.environ.get('BENCH_THROTTLE_STORE', 'LittleLemonAPI.throttling.CacheThrottleStore')
+THROTTLE_SQLITE_PATH = BASE_DIR / 'bench-throttle.sqlite3'
+
+if os.environ.get('BENCH_CATALOG_CACHE') == 'off':
+    CACHES = {**CACHES, 'catalog': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
@@ -0,0 +1,195 @@
+"""
+Replay the Insomnia collection against a seeded database and check the
+results against a saved baseline.
+
+    python -m benchmarks.suite --menu-items 5000 --orders 1000000 --concurrency 32 --requests 20000
+    python -m benchmarks.suite --save-baseline
+    python -m benchmarks.suite --queries-only
+
+Every request in Insomnia_2024-11-11.json is first issued in-process with
+cold caches inside a rolled-back transaction to count its queries. The
+requests are then replayed over HTTP against a local gunicorn or uvicorn
+server (or --url) at the given concurrency, and throughput and per-endpoint
+p50/p99 latency are printed. Requests in the Customer folder authenticate as
+the seeded customer, the rest as the seeded manager. Only GETs are replayed
+unless --include-writes is given.
+
+With --save-baseline the results are written to benchmarks/baseline.json.
+Otherwise, if that file exists, the run fails when an endpoint issues more
+queries than the baseline, or, when the load phase ran, when its p99 latency
+or the overall throughput is worse than the baseline by more than
+--tolerance.
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .loadgen import run_load
+from .seed import seed
+from .servers import ROOT, SETTINGS, serve, server_command
+
+COLLECTION = ROOT / 'Insomnia_2024-11-11.json'
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+# Latency differences below this many milliseconds are treated as noise
+NOISE_MS = 5.0
+
+
+def load_collection(path=COLLECTION, include_writes=False):
+    """Return the collection's requests as dicts with name, role, method, path and body."""
+    resources = json.loads(Path(path).read_text())['resources']
+    folders = {r['_id']: r['name'] for r in resources if r['_type'] == 'request_group'}
+    endpoints = []
+    for resource in resources:
+        if resource['_type'] != 'request':
+            continue
+        method = resource['method'].upper()
+        if method != 'GET' and not include_writes:
+            continue
+        url = resource['url'].strip()
+        parts = urlsplit(url if '://' in url else f'http://{url}')
+        body = (resource.get('body') or {}).get('text')
+        endpoints.append({
+            'name': resource['name'],
+            'role': 'customer' if folders.get(resource['parentId']) == 'Customer' else 'manager',
+            'method': method,
+            'path': parts.path + (f'?{parts.query}' if parts.query else ''),
+            # Bodies are ignored on GETs, so don't send them
+            'body': body if body and method != 'GET' else None,
+        })
+    return endpoints
+
+
+def headers_for(endpoint, tokens):
+    headers = {'Accept': 'application/json', 'Authorization': f"Token {tokens[endpoint['role']]}"}
+    if endpoint['body']:
+        headers['Content-Type'] = 'application/json'
+    return headers
+
+
+def count_queries(endpoints, tokens):
+    """Issue each request once with cold caches and return {name: (status, queries)}."""
+    from django.core.cache import caches
+    from django.db import connection, transaction
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+
+    from LittleLemonAPI.authentication import token_cache
+
+    setup_test_environment()
+    client = Client()
+    results = {}
+    with transaction.atomic():
+        for endpoint in endpoints:
+            for cache in caches.all():
+                cache.clear()
+            token_cache().clear()
+            headers = {key.lower().replace('-', '_'): value for key, value in headers_for(endpoint, tokens).items()}
+            with CaptureQueriesContext(connection) as queries:
+                send = getattr(client, endpoint['method'].lower())
+                if endpoint['body']:
+                    response = send(endpoint['path'], endpoint['body'], content_type=headers.pop('content_type'),
+                                    headers=headers, follow=True)
+                else:
+                    response = send(endpoint['path'], headers=headers, follow=True)
+            results[endpoint['name']] = (response.status_code, len(queries))
+        transaction.set_rollback(True)
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """Return a list of regressions of ``current`` against ``baseline``."""
+    failures = []
+    for name, result in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            failures.append(f"{name}: {result['queries']} queries, baseline {before['queries']}")
+        if 'p99_ms' in result and 'p99_ms' in before:
+            limit = max(before['p99_ms'] * (1 + tolerance), before['p99_ms'] + NOISE_MS)
+            if result['p99_ms'] > limit:
+                failures.append(f"{name}: p99 {result['p99_ms']:.1f} ms, baseline {before['p99_ms']:.1f} ms")
+    if 'rps' in current and 'rps' in baseline and current['rps'] < baseline['rps'] * (1 - tolerance):
+        failures.append(f"throughput {current['rps']:.1f} req/s, baseline {baseline['rps']:.1f} req/s")
+    return failures
+
+
+def report(current):
+    print(f"{'endpoint':<28} {'status':>6} {'queries':>7} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+    for name, result in current['endpoints'].items():
+        print(f"{name:<28} {result['status']:>6} {result['queries']:>7} {result.get('p50_ms', 0):>8.2f} "
+              f"{result.get('p99_ms', 0):>8.2f}  {result.get('statuses', '')}")
+    if 'rps' in current:
+        print(f"\n{current['requests']} requests at {current['rps']:.1f} req/s, "
+              f"p50 {current['p50_ms']:.2f} ms, p99 {current['p99_ms']:.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--menu-items', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--server', choices=['gunicorn', 'uvicorn'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--url', help='benchmark an already running server instead of starting one')
+    parser.add_argument('--include-writes', action='store_true')
+    parser.add_argument('--queries-only', action='store_true', help='skip the HTTP load phase')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    tokens = seed(menu_items=args.menu_items, orders=args.orders, users=args.users)
+    endpoints = load_collection(include_writes=args.include_writes)
+    counts = count_queries(endpoints, tokens)
+    current = {
+        'scale': {'menu_items': args.menu_items, 'orders': args.orders, 'users': args.users},
+        'endpoints': {name: {'status': status, 'queries': queries} for name, (status, queries) in counts.items()},
+    }
+
+    if not args.queries_only:
+        requests = [(e['method'], e['path'], e['body'], headers_for(e, tokens)) for e in endpoints]
+        process = None
+        url = args.url
+        if url is None:
+            env = {**os.environ, 'DJANGO_SETTINGS_MODULE': SETTINGS}
+            process = serve(server_command(args.server, args.port, args.workers, args.threads), args.port, env)
+            url = f'http://127.0.0.1:{args.port}'
+        try:
+            run_load(url, requests, args.concurrency, min(200, args.requests))  # warm up
+            result = run_load(url, requests, args.concurrency, args.requests)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        for endpoint, stats in zip(endpoints, result.pop('endpoints')):
+            current['endpoints'][endpoint['name']].update(
+                p50_ms=stats['p50_ms'], p99_ms=stats['p99_ms'], statuses=stats['statuses'])
+        current.update(requests=result['requests'], rps=result['rps'], p50_ms=result['p50_ms'], p99_ms=result['p99_ms'])
+
+    report(current)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(current, indent=2, default=str) + '\n')
+        print(f'\nBaseline saved to {args.baseline}')
+        return
+    if not args.baseline.exists():
+        return
+    failures = compare(current, json.loads(args.baseline.read_text()), args.tolerance)
+    if failures:
+        print('\nRegressions against the baseline:')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+    print('\nNo regressions against the baseline.')
+
+
+if __name__ == '__main__':
+    main()